@@ -1,14 +1,23 @@
 
+from hashlib import md5
+
 from django.contrib.syndication.views import Feed
 from django.core.urlresolvers import reverse
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils.feedgenerator import Atom1Feed
 from django.utils.html import strip_tags
+from django.views.decorators.http import condition
 
 from mezzanine.blog.models import BlogPost, BlogCategory
-from mezzanine.generic.models import Keyword
+from mezzanine.conf.models import Setting
+from mezzanine.core.models import Displayable
+from mezzanine.generic.models import AssignedKeyword, Keyword
 from mezzanine.pages.models import Page
 from mezzanine.conf import settings
+from mezzanine.utils.cache import add_cache_tags, cache_tag_versions
+from mezzanine.utils.cache import bump_model_cache_tags_on_change
+from mezzanine.utils.cache import cached_value, model_cache_tag
 from mezzanine.utils.models import get_user_model
 
 User = get_user_model()
@@ -19,18 +28,61 @@ class PostsRSS(Feed):
     RSS feed for all blog posts.
     """
 
+    cache_models = [BlogPost, BlogCategory, Keyword, AssignedKeyword,
+                    User, Page, Setting]
+
     def __init__(self, *args, **kwargs):
+        self.tag = kwargs.pop("tag", None)
+        self.category = kwargs.pop("category", None)
+        self.username = kwargs.pop("username", None)
+        super(PostsRSS, self).__init__(*args, **kwargs)
+
+    def __call__(self, request, *args, **kwargs):
+        """
+        Serves the feed document, which is stored in cache when it's
+        installed, keyed on the feed's URL, until a blog post or any
+        other content in the feed changes. The ``ETag`` and
+        ``Last-Modified`` headers are set from the document and its
+        newest post, so feed readers polling for changes are sent a
+        304 response when there aren't any.
+        """
+        # The feed contains the content of its posts, which doesn't
+        # bump the tag for ``BlogPost`` when it changes, so the feed
+        # is also keyed on the version of the tag for ``Displayable``.
+        tag = model_cache_tag(Displayable)
+        add_cache_tags(tag)
+        version = cache_tag_versions([tag]).get(tag, 0)
+        build = lambda *key: self.build(request, *args, **kwargs)
+        feed = cached_value("blog_feed", self.cache_models, build,
+                            request.path, request.is_secure(), version)
+        view = lambda request: HttpResponse(feed["content"],
+                                            content_type=feed["mime_type"])
+        etag = lambda request: feed["etag"]
+        last_modified = lambda request: feed["updated"]
+        return condition(etag, last_modified)(view)(request)
+
+    def build(self, request, *args, **kwargs):
+        """
+        Renders the feed document, returning it along with its
+        content type, ETag and the publish date of its newest post.
+        """
+        response = super(PostsRSS, self).__call__(request, *args, **kwargs)
+        return {
+            "content": response.content,
+            "mime_type": response["Content-Type"],
+            "etag": md5(response.content).hexdigest(),
+            "updated": self._updated,
+        }
+
+    def get_feed(self, obj, request):
         """
         Use the title and description of the Blog page for the feed's
         title and description. If the blog page has somehow been
         removed, fall back to the ``SITE_TITLE`` and ``SITE_TAGLINE``
         settings.
         """
-        self.tag = kwargs.pop("tag", None)
-        self.category = kwargs.pop("category", None)
-        self.username = kwargs.pop("username", None)
-        super(PostsRSS, self).__init__(*args, **kwargs)
         self._public = True
+        self._title = self._description = ""
         try:
             page = Page.objects.published().get(slug=settings.BLOG_SLUG)
         except Page.DoesNotExist:
@@ -45,6 +97,10 @@ class PostsRSS(Feed):
             else:
                 self._title = settings.SITE_TITLE
                 self._description = settings.SITE_TAGLINE
+        self._items = None
+        feed = super(PostsRSS, self).get_feed(obj, request)
+        self._updated = feed.latest_post_date()
+        return feed
 
     def title(self):
         return self._title
@@ -56,9 +112,18 @@ class PostsRSS(Feed):
         return reverse("blog_post_feed", kwargs={"format": "rss"})
 
     def items(self):
+        """
+        Returns the blog posts in the feed, with their authors and
+        categories retrieved up front, so that building the feed takes
+        the same number of queries however many posts it contains.
+        """
+        if self._items is not None:
+            return self._items
         if not self._public:
-            return []
+            self._items = []
+            return self._items
         blog_posts = BlogPost.objects.published().select_related("user")
+        blog_posts = blog_posts.prefetch_related("categories")
         if self.tag:
             tag = get_object_or_404(Keyword, slug=self.tag)
             blog_posts = blog_posts.filter(keywords__in=tag.assignments.all())
@@ -71,15 +136,20 @@ class PostsRSS(Feed):
         limit = settings.BLOG_RSS_LIMIT
         if limit is not None:
             blog_posts = blog_posts[:settings.BLOG_RSS_LIMIT]
-        return blog_posts
+        self._items = list(blog_posts)
+        return self._items
 
     def item_description(self, item):
         return item.content
 
     def categories(self):
-        if not self._public:
-            return []
-        return BlogCategory.objects.all()
+        """
+        Returns the categories of the posts in the feed.
+        """
+        categories = set()
+        for item in self.items():
+            categories.update(self.item_categories(item))
+        return sorted(categories, key=lambda category: category.title)
 
     def item_author_name(self, item):
         return item.user.get_full_name() or item.user.username
@@ -95,6 +165,9 @@ class PostsRSS(Feed):
         return item.categories.all()
 
 
+bump_model_cache_tags_on_change(PostsRSS.cache_models)
+
+
 class PostsAtom(PostsRSS):
     """
     Atom feed for all blog posts.
@@ -27,11 +27,13 @@ class BlogPost(Displayable, Ownable, RichText, AdminThumbMixin):
                                  verbose_name=_("Related posts"), blank=True)
 
     admin_thumb_field = "featured_image"
+    listing_fields = Displayable.listing_fields + ("user",)
 
     class Meta:
         verbose_name = _("Blog post")
         verbose_name_plural = _("Blog posts")
         ordering = ("-publish_date",)
+        index_together = [("site", "status", "publish_date")]
 
     @models.permalink
     def get_absolute_url(self):
@@ -1,10 +1,11 @@
 from datetime import datetime
 
+from django.db import connection
 from django.db.models import Count, Q
 
 from mezzanine.blog.forms import BlogPostForm
 from mezzanine.blog.models import BlogPost, BlogCategory
-from mezzanine.generic.models import Keyword
+from mezzanine.generic.models import AssignedKeyword, Keyword
 from mezzanine import template
 from mezzanine.utils.models import get_user_model
 
@@ -13,23 +14,26 @@ User = get_user_model()
 register = template.Library()
 
 
-@register.as_tag
+@register.as_tag(cache_models=[BlogPost])
 def blog_months(*args):
     """
-    Put a list of dates for blog posts into the template context.
+    Put a list of dates for blog posts into the template context,
+    with the number of posts published in each month. Posts are
+    grouped by month in the database.
     """
-    dates = BlogPost.objects.published().values_list("publish_date", flat=True)
-    date_dicts = [{"date": datetime(d.year, d.month, 1)} for d in dates]
-    month_dicts = []
-    for date_dict in date_dicts:
-        if date_dict not in month_dicts:
-            month_dicts.append(date_dict)
-    for i, date_dict in enumerate(month_dicts):
-        month_dicts[i]["post_count"] = date_dicts.count(date_dict)
-    return month_dicts
-
-
-@register.as_tag
+    qn = connection.ops.quote_name
+    column = "%s.%s" % (qn(BlogPost._meta.db_table), qn("publish_date"))
+    select = dict([(part, connection.ops.date_extract_sql(part, column))
+                   for part in ("year", "month")])
+    posts = BlogPost.objects.published().filter(publish_date__isnull=False)
+    months = posts.extra(select=select).values("year", "month")
+    months = months.annotate(post_count=Count("id"))
+    return [{"date": datetime(int(m["year"]), int(m["month"]), 1),
+             "post_count": m["post_count"]}
+            for m in months.order_by("-year", "-month")]
+
+
+@register.as_tag(cache_models=[BlogPost, BlogCategory])
 def blog_categories(*args):
     """
     Put a list of categories for blog posts into the template context.
@@ -39,7 +43,7 @@ def blog_categories(*args):
     return list(categories.annotate(post_count=Count("blogposts")))
 
 
-@register.as_tag
+@register.as_tag(cache_models=[BlogPost, User])
 def blog_authors(*args):
     """
     Put a list of authors (users) for blog posts into the template context.
@@ -49,7 +53,8 @@ def blog_authors(*args):
     return list(authors.annotate(post_count=Count("blogposts")))
 
 
-@register.as_tag
+@register.as_tag(cache_models=[BlogPost, BlogCategory, Keyword,
+                                AssignedKeyword, User])
 def blog_recent_posts(limit=5, tag=None, username=None, category=None):
     """
     Put a list of recently published blog posts into the template
@@ -47,7 +47,8 @@ def blog_post_list(request, tag=None, year=None, month=None, username=None,
     blog_posts = blog_posts.select_related("user").prefetch_related(*prefetch)
     blog_posts = paginate(blog_posts, request.GET.get("page", 1),
                           settings.BLOG_POST_PER_PAGE,
-                          settings.MAX_PAGING_LINKS)
+                          settings.MAX_PAGING_LINKS,
+                          keyset=("-publish_date", "-id"))
     context = {"blog_posts": blog_posts, "year": year, "month": month,
                "tag": tag, "category": category, "author": author}
     templates.append(template)
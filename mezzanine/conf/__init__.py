@@ -4,6 +4,9 @@ consistent access method for settings defined in applications, the project
 or Django itself. Settings can also be made editable via the admin.
 """
 
+from threading import Lock, local
+from time import time
+
 from django.conf import settings as django_settings
 from django.utils.encoding import force_unicode
 from django.utils.functional import Promise
@@ -46,6 +49,55 @@ def register_setting(name="", label="", editable=False, description="",
                           "choices": choices, "type": setting_type}
 
 
+# Editable settings versions are stored for 30 days, the maximum
+# relative expiry time supported by memcached.
+EDITABLE_VERSION_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def _editable_version_key(site_id):
+    """
+    Key in Django's cache for the version of the given site's
+    editable settings.
+    """
+    prefix = getattr(django_settings, "CACHE_MIDDLEWARE_KEY_PREFIX", "")
+    return "%s.editable_settings.%s" % (prefix, site_id)
+
+
+def _editable_versions_shared(cache):
+    """
+    Returns whether the given cache is shared between processes,
+    which the versions of editable settings stored in it rely on.
+    The local memory and dummy backends aren't, so with either of
+    them editable settings are always loaded from the database.
+    """
+    from django.core.cache.backends.dummy import DummyCache
+    from django.core.cache.backends.locmem import LocMemCache
+    return not isinstance(cache, (DummyCache, LocMemCache))
+
+
+def bump_editable_settings(site_id):
+    """
+    Changes the version of the given site's editable settings, so
+    that every process reloads them from the database on next access.
+    Called whenever a ``Setting`` is saved or deleted.
+    """
+    from django.core.cache import cache
+    cache.set(_editable_version_key(site_id), time(),
+              EDITABLE_VERSION_TIMEOUT)
+
+
+class _EditableState(local):
+    """
+    Per-thread state of the ``Settings`` object, so that calling
+    ``use_editable`` in one thread doesn't affect editable settings
+    being read in another.
+    """
+
+    def __init__(self):
+        self.loaded = True
+        self.editable = {}
+
+
 class Settings(object):
     """
     An object that provides settings via dynamic attribute access.
@@ -55,6 +107,14 @@ class Settings(object):
     When these values are accessed via this settings object, *all*
     database stored settings get retrieved from the database.
 
+    Editable settings loaded from the database are kept in memory for
+    the life of the process, per site, along with a version stored in
+    Django's cache. They're only loaded from the database again once
+    the version changes, which occurs whenever a ``Setting`` is saved
+    or deleted in any process sharing the cache. If Django's cache
+    isn't shared between processes, as with its default local memory
+    backend, they're loaded from the database each time instead.
+
     When accessing uneditable settings their default values are used,
     unless they've been given a value in the project's settings.py
     module.
@@ -66,28 +126,92 @@ class Settings(object):
 
     def __init__(self):
         """
-        The ``_loaded`` attribute is a flag for defining whether
-        editable settings have been loaded from the database. It
-        defaults to ``True`` here to avoid errors when the DB table
+        The ``loaded`` attribute of ``_state`` is a flag for defining
+        whether editable settings have been loaded from the database.
+        It defaults to ``True`` here to avoid errors when the DB table
         is first created. It's then set to ``False`` whenever the
         ``use_editable`` method is called, which should be called
-        before using editable settings in the database.
-        ``_editable_cache`` is the dict that stores the editable
-        settings once they're loaded from the database, the first
-        time an editable setting is accessed.
+        before using editable settings in the database. The
+        ``editable`` attribute of ``_state`` is the dict that stores
+        the editable settings once they're loaded, the first time an
+        editable setting is accessed. Both are local to the current
+        thread.
+
+        ``_editable_caches`` maps site IDs to the version and editable
+        settings last loaded from the database for each site, and is
+        shared by all threads. Its dicts of editable settings are
+        never modified once loaded, only replaced, and
+        ``_editable_lock`` ensures only one thread at a time loads
+        them from the database.
         """
-        self._loaded = True
-        self._editable_cache = {}
+        self._state = _EditableState()
+        self._editable_caches = {}
+        self._editable_lock = Lock()
 
     def use_editable(self):
         """
         Empty the editable settings cache and set the loaded flag to
-        ``False`` so that settings will be loaded from the DB on next
-        access. If the conf app is not installed then set the loaded
-        flag to ``True`` in order to bypass DB lookup entirely.
+        ``False`` so that settings will be loaded on next access, from
+        memory if their version is unchanged, otherwise from the DB.
+        If the conf app is not installed then set the loaded flag to
+        ``True`` in order to bypass DB lookup entirely.
         """
-        self._loaded = __name__ not in getattr(self, "INSTALLED_APPS")
-        self._editable_cache = {}
+        self._state.loaded = __name__ not in getattr(self, "INSTALLED_APPS")
+        self._state.editable = {}
+
+    def _load_editable(self):
+        """
+        Returns the editable settings for the current site, loading
+        them from the DB if they haven't been loaded yet in this
+        process, or their version in Django's cache has changed since
+        they were, or the cache isn't shared between processes.
+        """
+        from django.core.cache import cache
+        from mezzanine.utils.sites import current_site_id
+        if not _editable_versions_shared(cache):
+            return self._load_editable_from_db()
+        site_id = current_site_id()
+        version_key = _editable_version_key(site_id)
+        version = cache.get(version_key)
+        if version is None:
+            version = time()
+            if not cache.add(version_key, version, EDITABLE_VERSION_TIMEOUT):
+                version = cache.get(version_key)
+        with self._editable_lock:
+            try:
+                loaded_version, editable = self._editable_caches[site_id]
+            except KeyError:
+                pass
+            else:
+                if loaded_version == version:
+                    return editable
+            editable = self._load_editable_from_db()
+            self._editable_caches[site_id] = (version, editable)
+        return editable
+
+    def _load_editable_from_db(self):
+        """
+        Returns a new dict of editable settings for the current site
+        loaded from the DB, and removes settings from the DB that are
+        no longer registered.
+        """
+        from mezzanine.conf.models import Setting
+        editable = {}
+        removed = []
+        for setting_obj in Setting.objects.all():
+            try:
+                setting_type = registry[setting_obj.name]["type"]
+            except KeyError:
+                removed.append(setting_obj.id)
+            else:
+                if setting_type is bool:
+                    setting_value = setting_obj.value != "False"
+                else:
+                    setting_value = setting_type(setting_obj.value)
+                editable[setting_obj.name] = setting_value
+        if removed:
+            Setting.objects.filter(id__in=removed).delete()
+        return editable
 
     def __getattr__(self, name):
 
@@ -97,33 +221,18 @@ class Settings(object):
         except KeyError:
             return getattr(django_settings, name)
 
-        # First access for an editable setting - load from DB into cache.
-        # Also remove settings from the DB that are no longer registered.
-        if setting["editable"] and not self._loaded:
-            from mezzanine.conf.models import Setting
-            settings = Setting.objects.all()
-            removed = []
-            for setting_obj in settings:
-                try:
-                    setting_type = registry[setting_obj.name]["type"]
-                except KeyError:
-                    removed.append(setting_obj.id)
-                else:
-                    if setting_type is bool:
-                        setting_value = setting_obj.value != "False"
-                    else:
-                        setting_value = setting_type(setting_obj.value)
-                    self._editable_cache[setting_obj.name] = setting_value
-            if removed:
-                Setting.objects.filter(id__in=removed).delete()
-            self._loaded = True
+        # First access for an editable setting - load into cache.
+        state = self._state
+        if setting["editable"] and not state.loaded:
+            state.editable = self._load_editable()
+            state.loaded = True
 
         # Use cached editable setting if found, otherwise use the
         # value defined in the project's settings.py module if it
         # exists, finally falling back to the default defined when
         # registered.
         try:
-            return self._editable_cache[name]
+            return state.editable[name]
         except KeyError:
             return getattr(django_settings, name, setting["default"])
 
@@ -1,7 +1,9 @@
 
 from django.db import models
+from django.db.models.signals import post_delete, post_save
 from django.utils.translation import ugettext_lazy as _
 
+from mezzanine.conf import bump_editable_settings
 from mezzanine.core.models import SiteRelated
 
 
@@ -19,3 +21,14 @@ class Setting(SiteRelated):
 
     def __unicode__(self):
         return "%s: %s" % (self.name, self.value)
+
+
+def setting_changed(sender, instance, **kw):
+    """
+    Reload editable settings in every process once a ``Setting``
+    changes.
+    """
+    bump_editable_settings(instance.site_id)
+
+post_save.connect(setting_changed, sender=Setting)
+post_delete.connect(setting_changed, sender=Setting)
@@ -60,6 +60,48 @@ register_setting(
     default="",
 )
 
+register_setting(
+    name="CACHE_COMPRESS",
+    description=_("If ``True``, responses stored by Mezzanine's cache "
+        "middleware are gzipped, and responses without any content "
+        "wrapped in the ``nevercache`` tag are sent gzipped directly from "
+        "cache to clients that accept it."),
+    editable=False,
+    default=False,
+)
+
+register_setting(
+    name="CACHE_LEASE_SECONDS",
+    description=_("When a mint cache entry expires or is missing, the "
+        "first client to request it acquires a lease for regenerating it, "
+        "and other clients are given the stale entry, or wait for the "
+        "new one, until the lease is released. This is the maximum number "
+        "of seconds a lease is held for, in case the client holding it "
+        "never sets the new entry."),
+    editable=False,
+    default=30,
+)
+
+register_setting(
+    name="CACHE_LEASE_WAIT_SECONDS",
+    description=_("Maximum number of seconds a request will wait for a "
+        "missing response in Mezzanine's cache to be rendered by the "
+        "request holding the lease for it, before rendering the response "
+        "itself. Set to ``0`` to never wait."),
+    editable=False,
+    default=2,
+)
+
+register_setting(
+    name="CACHE_NEVERCACHE_TEMPLATES",
+    description=_("Maximum number of compiled templates for content "
+        "wrapped in the ``nevercache`` tag, that are kept in memory per "
+        "process for rendering cached responses. Set to ``0`` to compile "
+        "them on every request."),
+    editable=False,
+    default=100,
+)
+
 register_setting(
     name="CACHE_SET_DELAY_SECONDS",
     description=_("Mezzanine's caching uses a technique know as mint "
@@ -224,6 +266,26 @@ register_setting(
     default=(),
 )
 
+register_setting(
+    name="PAGINATION_COUNT_LIMIT",
+    description=_("When ``PAGINATION_KEYSET`` is ``True``, the maximum "
+        "number of items counted for displaying the total number of "
+        "items being paginated, beyond which the total is shown as "
+        "approximate. Use ``0`` to always count every item."),
+    editable=False,
+    default=1000,
+)
+
+register_setting(
+    name="PAGINATION_KEYSET",
+    description=_("If ``True``, the blog post listing and search results "
+        "are paginated with cursors for the next and previous pages, "
+        "rather than page numbers, so that deep pages don't require "
+        "the database to count and skip over every preceding item."),
+    editable=False,
+    default=False,
+)
+
 register_setting(
     name="RICHTEXT_WIDGET_CLASS",
     description=_("Dotted package path and class name of the widget to use "
@@ -315,6 +377,23 @@ register_setting(
     default=RICHTEXT_FILTER_LEVEL_HIGH,
 )
 
+register_setting(
+    name="SEARCH_BACKEND",
+    description=_("Dotted path to the search backend class used for "
+        "searching models with ``SearchableManager``. The default "
+        "``mezzanine.core.search.DatabaseSearchBackend`` searches each "
+        "search field directly, while "
+        "``mezzanine.core.search.IndexSearchBackend`` maintains a search "
+        "index for models that subclass "
+        "``mezzanine.core.models.Displayable``, which can be built for "
+        "existing content with the ``rebuild_search_index`` command. "
+        "``mezzanine.core.search.PostgresSearchBackend`` uses PostgreSQL's "
+        "full-text search, and falls back to searching each search field "
+        "on other databases."),
+    editable=False,
+    default="mezzanine.core.search.DatabaseSearchBackend",
+)
+
 register_setting(
     name="SEARCH_MODEL_CHOICES",
     description=_("Sequence of models that will be provided by default as "
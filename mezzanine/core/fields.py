@@ -108,6 +108,19 @@ class MultiChoiceField(models.CharField):
         return ",".join(value)
 
 
+class SearchVectorField(models.TextField):
+    """
+    Stores a PostgreSQL ``tsvector``, maintained by
+    ``mezzanine.core.search.PostgresSearchBackend``. On other databases
+    this is a plain text column that remains empty.
+    """
+
+    def db_type(self, connection):
+        if connection.vendor == "postgresql":
+            return "tsvector"
+        return super(SearchVectorField, self).db_type(connection)
+
+
 # Define a ``FileField`` that maps to filebrowser's ``FileBrowseField``
 # if available, falling back to Django's ``FileField`` otherwise.
 try:
@@ -135,6 +148,7 @@ if "south" in settings.INSTALLED_APPS:
     try:
         from south.modelsinspector import add_introspection_rules
         add_introspection_rules(patterns=["mezzanine\.core\.fields\."],
-            rules=[((FileField, RichTextField, MultiChoiceField), [], {})])
+            rules=[((FileField, RichTextField, MultiChoiceField,
+                     SearchVectorField), [], {})])
     except ImportError:
         pass
@@ -0,0 +1,39 @@
+
+from django.core.management.base import NoArgsCommand
+from django.db.models import get_models
+
+from mezzanine.core.models import Displayable
+from mezzanine.core.search import get_search_backend
+
+
+class Command(NoArgsCommand):
+    """
+    Indexes every instance of each model that subclasses
+    ``Displayable`` with the search backend defined by the
+    ``SEARCH_BACKEND`` setting. Only required for content that
+    existed before the backend was configured, or was modified
+    without being saved via the ORM, since instances are otherwise
+    indexed as they're saved.
+    """
+
+    help = ("Indexes all Displayable instances with the configured "
+            "search backend.")
+    can_import_settings = True
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get("verbosity", 1))
+        backend = get_search_backend()
+        models = [m for m in get_models() if issubclass(m, Displayable)]
+        # Index parent models such as ``Page`` first, so that their
+        # instances are then indexed again by subclasses with any
+        # search fields the subclasses add. Instances of all sites are
+        # indexed, so the base manager is used.
+        models.sort(key=lambda m: len(m._meta.get_parent_list()))
+        for model in models:
+            count = 0
+            for instance in model._base_manager.all():
+                backend.index(instance)
+                count += 1
+            if verbosity >= 1:
+                self.stdout.write("Indexed %s %s" %
+                                  (count, model._meta.verbose_name_plural))
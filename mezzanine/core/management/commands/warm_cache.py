@@ -0,0 +1,155 @@
+
+import os
+from multiprocessing.pool import ThreadPool
+from optparse import make_option
+from threading import Lock
+from time import sleep, time
+
+from django.contrib.sites.models import Site
+from django.core.management.base import NoArgsCommand, CommandError
+from django.core.urlresolvers import NoReverseMatch, reverse
+from django.test.client import Client
+
+from mezzanine.conf import settings
+from mezzanine.core.sitemaps import DisplayableSitemap
+from mezzanine.utils.cache import cache_installed
+
+
+class Command(NoArgsCommand):
+    """
+    Requests the URL for every item in ``DisplayableSitemap`` for each
+    site, device and language, so that responses are rendered into
+    Mezzanine's cache before any real requests are made for them.
+    The homepage is requested first, followed by top-level pages and
+    then pages further down the URL hierarchy.
+    """
+
+    help = ("Renders every URL in the sitemap into Mezzanine's cache, "
+            "for each site, device and language.")
+    can_import_settings = True
+    option_list = NoArgsCommand.option_list + (
+        make_option("--concurrency", dest="concurrency", type="int",
+                    default=4, help="Number of concurrent requests"),
+        make_option("--rate", dest="rate", type="float", default=0,
+                    help="Maximum number of requests per second, "
+                         "or 0 for no limit"),
+        make_option("--site", action="append", dest="sites", default=[],
+                    help="Domain of a site to warm, can be given "
+                         "multiple times. Defaults to all sites."),
+    )
+
+    def handle_noargs(self, **options):
+        if not cache_installed():
+            raise CommandError("Mezzanine's cache middleware is not "
+                               "installed, or no cache backend is "
+                               "configured.")
+        self.verbosity = int(options.get("verbosity", 1))
+        self.rate = options.get("rate") or 0
+        self.next_request = time()
+        self.lock = Lock()
+        sites = Site.objects.all()
+        if options.get("sites"):
+            sites = sites.filter(domain__in=options["sites"])
+        requests = []
+        for site in sites:
+            for url in self.get_urls(site):
+                for device in self.get_devices():
+                    for language in self.get_languages():
+                        requests.append((site, url, device, language))
+        pool = ThreadPool(max(options.get("concurrency") or 1, 1))
+        start = time()
+        results = pool.imap(self.warm, requests)
+        errors = 0
+        for (site, url, device, language), status, duration in results:
+            if status is None or status >= 400:
+                errors += 1
+            if self.verbosity >= 1:
+                self.stdout.write("%s %.3fs %s%s %s %s" % (status, duration,
+                    site.domain, url, device or "default", language or ""))
+        pool.close()
+        pool.join()
+        if self.verbosity >= 1:
+            self.stdout.write("Warmed %s URLs in %.3fs with %s errors" %
+                              (len(requests), time() - start, errors))
+
+    def get_urls(self, site):
+        """
+        Returns the URLs in ``DisplayableSitemap`` for the given site,
+        ordered by priority.
+        """
+        site_id = os.environ.get("MEZZANINE_SITE_ID")
+        os.environ["MEZZANINE_SITE_ID"] = str(site.id)
+        try:
+            urls = set([i.get_absolute_url()
+                        for i in DisplayableSitemap().items()])
+        finally:
+            if site_id is None:
+                del os.environ["MEZZANINE_SITE_ID"]
+            else:
+                os.environ["MEZZANINE_SITE_ID"] = site_id
+        return self.sort_urls(urls)
+
+    def sort_urls(self, urls):
+        """
+        Orders the given URLs with the homepage first, followed by
+        each level of the URL hierarchy. The homepage is "/" if
+        there's no urlpattern named "home".
+        """
+        try:
+            home = reverse("home")
+        except NoReverseMatch:
+            home = "/"
+        priority = lambda url: (url != home, url.strip("/").count("/"), url)
+        return sorted(urls, key=priority)
+
+    def get_devices(self):
+        """
+        Returns the device names from the ``DEVICE_USER_AGENTS``
+        setting, along with the default device.
+        """
+        return [""] + [device for (device, _) in settings.DEVICE_USER_AGENTS]
+
+    def get_languages(self):
+        """
+        Returns the language codes from the ``LANGUAGES`` setting
+        when i18n is enabled, since cache keys include the language.
+        """
+        if not settings.USE_I18N:
+            return [None]
+        return [code for (code, _) in settings.LANGUAGES]
+
+    def throttle(self):
+        """
+        Blocks until the next request is allowed by the ``--rate``
+        option.
+        """
+        if not self.rate:
+            return
+        with self.lock:
+            wait = self.next_request - time()
+            self.next_request = max(self.next_request, time()) + 1 / self.rate
+        if wait > 0:
+            sleep(wait)
+
+    def warm(self, request):
+        """
+        Requests a single URL using Django's test client, which runs
+        the request through the full middleware stack, including
+        Mezzanine's cache middleware. Returns the request along with
+        the response's status code and the time taken.
+        """
+        site, url, device, language = request
+        headers = {"HTTP_HOST": site.domain}
+        if device:
+            headers["HTTP_COOKIE"] = "mezzanine-device=%s" % device
+        if language:
+            headers["HTTP_ACCEPT_LANGUAGE"] = language
+        self.throttle()
+        start = time()
+        try:
+            status = Client().get(url, **headers).status_code
+        except Exception, e:
+            status = None
+            if self.verbosity >= 2:
+                self.stderr.write("Error requesting %s: %s" % (url, e))
+        return request, status, time() - start
@@ -1,14 +1,19 @@
 
-from operator import ior, iand
-from string import punctuation
+from operator import ior
 
-from django.db.models import Manager, Q, CharField, TextField, get_models
+from django.db.models import Manager, Min, Q, CharField, TextField
+from django.db.models import get_models
 from django.db.models.manager import ManagerDescriptor
 from django.db.models.query import QuerySet
 from django.contrib.sites.managers import CurrentSiteManager as DjangoCSM
 from django.utils.timezone import now
 
 from mezzanine.conf import settings
+from mezzanine.core.search import SearchResults, get_search_backend
+from mezzanine.core.search import parse_query
+from mezzanine.utils.cache import add_cache_tags, cache_get, cache_installed
+from mezzanine.utils.cache import cache_set, cache_tag_versions
+from mezzanine.utils.cache import model_cache_tag
 from mezzanine.utils.sites import current_site_id
 
 
@@ -22,15 +27,65 @@ class PublishedManager(Manager):
         """
         For non-staff users, return items with a published status and
         whose publish and expiry dates fall before and after the
-        current date when specified.
+        current date when specified. ``publish_date`` is set when
+        items are saved, but items of custom ``Displayable`` models
+        saved before this was the case may not have one, so they're
+        treated as published from the start.
+
+        The model's cache tag is recorded against the current request,
+        so that a cached response listing published items becomes stale
+        whenever any of them change.
         """
         from mezzanine.core.models import CONTENT_STATUS_PUBLISHED
+        add_cache_tags(model_cache_tag(self.model))
         if for_user is not None and for_user.is_staff:
             return self.all()
+        current = now()
         return self.filter(
-            Q(publish_date__lte=now()) | Q(publish_date__isnull=True),
-            Q(expiry_date__gte=now()) | Q(expiry_date__isnull=True),
-            Q(status=CONTENT_STATUS_PUBLISHED))
+            Q(publish_date__lte=current) | Q(publish_date__isnull=True),
+            Q(expiry_date__gte=current) | Q(expiry_date__isnull=True),
+            status=CONTENT_STATUS_PUBLISHED)
+
+    def next_visibility_change(self):
+        """
+        Returns the next date after now at which a published item's
+        publish date or expiry date passes, changing the items returned
+        by ``published`` for non-staff users, or ``None``.
+
+        When the cache is installed, the date is stored in cache until
+        it passes, or the model's cache tag is bumped by an item being
+        saved or deleted, so it's only queried for once per change.
+        """
+        if not cache_installed():
+            return self._next_visibility_change()
+        tag = model_cache_tag(self.model)
+        version = cache_tag_versions([tag]).get(tag, 0)
+        cache_key = "%s.next_visibility_change.%s.%s.%r" % (
+            settings.CACHE_MIDDLEWARE_KEY_PREFIX, tag, current_site_id(),
+            version)
+        # ``False`` is stored when there's no change scheduled, since
+        # ``None`` is a cache miss.
+        change = cache_get(cache_key)
+        if change is None or (change and change <= now()):
+            change = self._next_visibility_change() or False
+            cache_set(cache_key, change)
+        return change or None
+
+    def _next_visibility_change(self):
+        """
+        Queries for the date returned by ``next_visibility_change``.
+        """
+        from mezzanine.core.models import CONTENT_STATUS_PUBLISHED
+        published = self.filter(status=CONTENT_STATUS_PUBLISHED)
+        current = now()
+        dates = [
+            published.filter(publish_date__gt=current).aggregate(
+                date=Min("publish_date"))["date"],
+            published.filter(expiry_date__gt=current).aggregate(
+                date=Min("expiry_date"))["date"],
+        ]
+        dates = [date for date in dates if date is not None]
+        return min(dates) if dates else None
 
     def get_by_natural_key(self, slug):
         return self.get(slug=slug)
@@ -60,7 +115,6 @@ class SearchableQuerySet(QuerySet):
     """
 
     def __init__(self, *args, **kwargs):
-        self._search_ordered = False
         self._search_terms = set()
         self._search_fields = kwargs.pop("search_fields", {})
         super(SearchableQuerySet, self).__init__(*args, **kwargs)
@@ -84,31 +138,9 @@ class SearchableQuerySet(QuerySet):
 
         #### BUILD LIST OF TERMS TO SEARCH FOR ###
 
-        # Remove extra spaces, put modifiers inside quoted terms.
-        terms = " ".join(query.split()).replace("+ ", "+")     \
-                                       .replace('+"', '"+')    \
-                                       .replace("- ", "-")     \
-                                       .replace('-"', '"-')    \
-                                       .split('"')
-        # Strip punctuation other than modifiers from terms and create
-        # terms list, first from quoted terms and then remaining words.
-        terms = [("" if t[0:1] not in "+-" else t[0:1]) + t.strip(punctuation)
-            for t in terms[1::2] + "".join(terms[::2]).split()]
-        # Remove stop words from terms that aren't quoted or use
-        # modifiers, since words with these are an explicit part of
-        # the search query. If doing so ends up with an empty term
-        # list, then keep the stop words.
-        terms_no_stopwords = [t for t in terms if t.lower() not in
-            settings.STOP_WORDS]
-        get_positive_terms = lambda terms: [t.lower().strip(punctuation)
-            for t in terms if t[0:1] != "-"]
-        positive_terms = get_positive_terms(terms_no_stopwords)
-        if positive_terms:
-            terms = terms_no_stopwords
-        else:
-            positive_terms = get_positive_terms(terms)
+        terms, positive_terms = parse_query(query)
         # Append positive terms (those without the negative modifier)
-        # to the internal list for sorting when results are iterated.
+        # to the internal list for ranking results.
         if not positive_terms:
             return self.none()
         else:
@@ -116,60 +148,17 @@ class SearchableQuerySet(QuerySet):
 
         #### BUILD QUERYSET FILTER ###
 
-        # Create the queryset combining each set of terms.
-        excluded = [reduce(iand, [~Q(**{"%s__icontains" % f: t[1:]}) for f in
-            self._search_fields.keys()]) for t in terms if t[0:1] == "-"]
-        required = [reduce(ior, [Q(**{"%s__icontains" % f: t[1:]}) for f in
-            self._search_fields.keys()]) for t in terms if t[0:1] == "+"]
-        optional = [reduce(ior, [Q(**{"%s__icontains" % f: t}) for f in
-            self._search_fields.keys()]) for t in terms if t[0:1] not in "+-"]
-        queryset = self
-        if excluded:
-            queryset = queryset.filter(reduce(iand, excluded))
-        if required:
-            queryset = queryset.filter(reduce(iand, required))
-        # Optional terms aren't relevant to the filter if there are
-        # terms that are explicitly required.
-        elif optional:
-            queryset = queryset.filter(reduce(ior, optional))
-        return queryset
+        backend = get_search_backend()
+        return backend.rank(backend.search(self, terms))
 
     def _clone(self, *args, **kwargs):
         """
         Ensure attributes are copied to subsequent queries.
         """
-        for attr in ("_search_terms", "_search_fields", "_search_ordered"):
+        for attr in ("_search_terms", "_search_fields"):
             kwargs[attr] = getattr(self, attr)
         return super(SearchableQuerySet, self)._clone(*args, **kwargs)
 
-    def order_by(self, *field_names):
-        """
-        Mark the filter as being ordered if search has occurred.
-        """
-        if not self._search_ordered:
-            self._search_ordered = len(self._search_terms) > 0
-        return super(SearchableQuerySet, self).order_by(*field_names)
-
-    def iterator(self):
-        """
-        If search has occurred and no ordering has occurred, decorate
-        each result with the number of search terms so that it can be
-        sorted by the number of occurrence of terms.
-        """
-        results = super(SearchableQuerySet, self).iterator()
-        if self._search_terms and not self._search_ordered:
-            results = list(results)
-            for i, result in enumerate(results):
-                count = 0
-                for (field, weight) in self._search_fields.items():
-                    for term in self._search_terms:
-                        field_value = getattr(result, field)
-                        if field_value:
-                            count += field_value.lower().count(term) * weight
-                results[i].result_count = count
-            return iter(results)
-        return results
-
 
 class SearchableManager(Manager):
     """
@@ -235,7 +224,11 @@ class SearchableManager(Manager):
         """
         Proxy to queryset's search method for the manager's model and
         any models that subclass from this manager's model if the
-        model is abstract.
+        model is abstract. In the latter case, a lazy sequence of
+        results is returned, which either merges the ranked results of
+        each model as they're sliced, or with search backends that
+        store a search document for each instance, queries the
+        documents of all models at once.
         """
         if getattr(self.model._meta, "abstract", False):
             models = [m for m in get_models() if issubclass(m, self.model)]
@@ -248,15 +241,25 @@ class SearchableManager(Manager):
             models = [m for m in models if m not in parents]
         else:
             models = [self.model]
-        all_results = []
         user = kwargs.pop("for_user", None)
+        # Search across models with a single query against their
+        # search documents, if the search backend supports it.
+        backend = get_search_backend()
+        if len(models) > 1 and hasattr(backend, "search_documents"):
+            results = backend.search_documents(models, *args,
+                                               for_user=user, **kwargs)
+            if results is not None:
+                return results
+        querysets = []
         for model in models:
             try:
                 queryset = model.objects.published(for_user=user)
             except AttributeError:
                 queryset = model.objects.get_query_set()
-            all_results.extend(queryset.search(*args, **kwargs))
-        return sorted(all_results, key=lambda r: r.result_count, reverse=True)
+            querysets.append(queryset.search(*args, **kwargs))
+        if len(querysets) == 1:
+            return querysets[0]
+        return SearchResults(querysets)
 
 
 class CurrentSiteManager(DjangoCSM):
@@ -1,19 +1,33 @@
 
+import re
+from gzip import GzipFile
+from io import BytesIO
+from time import time
+
 from django.contrib import admin
 from django.contrib.auth import logout
 from django.contrib.redirects.models import Redirect
 from django.core.exceptions import MiddlewareNotUsed
 from django.core.urlresolvers import reverse
 from django.http import (HttpResponse, HttpResponseRedirect,
-                         HttpResponsePermanentRedirect, HttpResponseGone)
-from django.utils.cache import get_max_age
-from django.template import Template, RequestContext
+                         HttpResponsePermanentRedirect, HttpResponseGone,
+                         HttpResponseNotModified)
+from django.utils.cache import get_max_age, patch_vary_headers
+from django.utils.http import parse_etags, parse_http_date_safe
+from django.utils.text import compress_string
+from django.template import RequestContext
 from django.middleware.csrf import CsrfViewMiddleware, get_token
+from django.middleware.gzip import re_accepts_gzip
 
 from mezzanine.conf import settings
 from mezzanine.core.models import SitePermission
+from mezzanine.core.request import _thread_local
 from mezzanine.utils.cache import (cache_key_prefix, nevercache_token,
-                                   cache_get, cache_set, cache_installed)
+                                   cache_get, cache_set, cache_installed,
+                                   cache_release, nevercache_template,
+                                   split_nevercache, cache_lease,
+                                   cache_tags_bumped,
+                                   next_visibility_change)
 from mezzanine.utils.device import templates_for_device
 from mezzanine.utils.sites import current_site_id, templates_for_host
 
@@ -106,6 +120,161 @@ class TemplateForHostMiddleware(object):
         return response
 
 
+# Version of the format responses are stored in by the cache
+# middleware. Entries stored with any other version are ignored.
+CACHE_RESPONSE_VERSION = 4
+
+# Headers copied from a cached response to a 304 response.
+NOT_MODIFIED_HEADERS = ("Cache-Control", "Content-Location", "Date", "ETag",
+                        "Expires", "Last-Modified", "Vary")
+
+
+def _response_segments(response):
+    """
+    Returns the response's content split into static and
+    ``nevercache`` segments via ``split_nevercache``. The segments
+    are already assigned to the response when it's been retrieved
+    from cache, otherwise they're assigned here so that the content
+    is only ever split once.
+    """
+    try:
+        return response._nevercache_segments
+    except AttributeError:
+        response._nevercache_segments = split_nevercache(response.content)
+        return response._nevercache_segments
+
+
+def _decompress_string(s):
+    """
+    Reverse of Django's ``compress_string``.
+    """
+    return GzipFile(mode="rb", fileobj=BytesIO(s)).read()
+
+
+def _accepts_gzip(request, response):
+    """
+    Returns ``True`` if the given response can be sent gzipped to
+    the client, using the same checks as Django's ``GZipMiddleware``.
+    """
+    if "msie" in request.META.get("HTTP_USER_AGENT", "").lower():
+        content_type = response.get("Content-Type", "").lower()
+        if (not content_type.startswith("text/") or
+                "javascript" in content_type):
+            return False
+    accept_encoding = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    return bool(re_accepts_gzip.search(accept_encoding))
+
+
+def _pack_response(response, request):
+    """
+    Returns the value stored in cache for the given response, which
+    contains its status code and headers along with its content.
+    ``Content-Length`` is left out since it changes whenever the
+    response contains ``nevercache`` content.
+
+    Also stored are the cache tags recorded against the request
+    while the response was rendered, and the time rendering began,
+    so that the response can be marked as stale when any of its tags
+    are bumped. Tags for individual instances are left out when the
+    tag for their model was also recorded, since the model's tag is
+    bumped whenever any of its instances are.
+
+    If the ``CACHE_COMPRESS`` setting is ``True``, each segment of
+    static content is stored gzipped, so that responses without any
+    ``nevercache`` content can be sent as is to clients that accept
+    gzip.
+    """
+    headers = [(k, v) for (k, v) in response.items()
+               if k.lower() != "content-length"]
+    segments = _response_segments(response)
+    compressed = (settings.CACHE_COMPRESS and
+                  not response.has_header("Content-Encoding") and
+                  sum([len(s) for s in segments[::2]]) >= 200)
+    if compressed:
+        segments = list(segments)
+        for i in range(0, len(segments), 2):
+            segments[i] = compress_string(segments[i])
+    tags = getattr(request, "_cache_tags", set())
+    tags = [t for t in tags if t.rsplit(".", 1)[0] not in tags]
+    started = getattr(request, "_cache_started", time())
+    return (CACHE_RESPONSE_VERSION, response.status_code, headers, segments,
+            compressed, tags, started)
+
+
+def _unpack_response(packed, request):
+    """
+    Returns a response for a value retrieved from cache, or ``None``
+    if the value was stored with a different format version. The
+    content is only ever split when the value is stored, so here
+    we just assign the segments to the response for
+    ``UpdateCacheMiddleware`` to render.
+
+    Gzipped responses without any ``nevercache`` content are
+    returned still gzipped if the client accepts it, otherwise their
+    static content is decompressed.
+    """
+    try:
+        version, status, headers, segments, compressed, tags, started = packed
+    except (TypeError, ValueError):
+        return None
+    if version != CACHE_RESPONSE_VERSION:
+        return None
+    response = HttpResponse(status=status)
+    for (header, value) in headers:
+        response[header] = value
+    if compressed:
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if len(segments) == 1 and _accepts_gzip(request, response):
+            if response.has_header("ETag"):
+                response["ETag"] = re.sub('"$', ';gzip"', response["ETag"])
+            response["Content-Encoding"] = "gzip"
+        else:
+            segments = list(segments)
+            for i in range(0, len(segments), 2):
+                segments[i] = _decompress_string(segments[i])
+    if len(segments) == 1:
+        response.content = segments[0]
+    else:
+        sources = [s if not i % 2 else s[1] for i, s in enumerate(segments)]
+        response.content = nevercache_token().join(sources)
+    response._nevercache_segments = segments
+    response._cache_tags = tags
+    response._cache_started = started
+    return response
+
+
+def _not_modified(request, response):
+    """
+    Returns a 304 response if the conditional GET headers in the
+    request match the ``ETag`` or ``Last-Modified`` headers of the
+    given response retrieved from cache, otherwise ``None``. Only
+    applies to responses without any ``nevercache`` content, since
+    the content of those differs with every request.
+    """
+    if len(response._nevercache_segments) > 1:
+        return None
+    matched = False
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if_modified_since = request.META.get("HTTP_IF_MODIFIED_SINCE")
+    if if_none_match and response.has_header("ETag"):
+        etags = parse_etags(if_none_match)
+        etag = parse_etags(response["ETag"])[0]
+        matched = "*" in etags or etag in etags
+    elif if_modified_since and response.has_header("Last-Modified"):
+        if_modified_since = parse_http_date_safe(if_modified_since)
+        last_modified = parse_http_date_safe(response["Last-Modified"])
+        matched = (if_modified_since is not None and
+                   last_modified is not None and
+                   last_modified <= if_modified_since)
+    if not matched:
+        return None
+    not_modified = HttpResponseNotModified()
+    for header in NOT_MODIFIED_HEADERS:
+        if response.has_header(header):
+            not_modified[header] = response[header]
+    return not_modified
+
+
 class UpdateCacheMiddleware(object):
     """
     Response phase for Mezzanine's cache middleware. Handles caching
@@ -114,6 +283,19 @@ class UpdateCacheMiddleware(object):
     """
 
     def process_response(self, request, response):
+        """
+        Runs with the request stored as the current request again,
+        since ``CurrentRequestMiddleware`` has already let go of it
+        by now, and both caching the response and rendering its
+        ``nevercache`` content may need to determine the current site.
+        """
+        _thread_local.request = request
+        try:
+            return self._process_response(request, response)
+        finally:
+            _thread_local.request = None
+
+    def _process_response(self, request, response):
 
         # Cache the response if all the required conditions are met.
         # Response must be marked for updating by the
@@ -127,20 +309,36 @@ class UpdateCacheMiddleware(object):
         timeout = get_max_age(response)
         if timeout is None:
             timeout = settings.CACHE_MIDDLEWARE_SECONDS
-        if anon and valid_status and marked_for_update and timeout:
+        if marked_for_update:
             cache_key = cache_key_prefix(request) + request.get_full_path()
-            _cache_set = lambda r: cache_set(cache_key, r.content, timeout)
-            if callable(getattr(response, "render", None)):
-                response.add_post_render_callback(_cache_set)
+            if anon and valid_status and timeout:
+                # Expire the response when published content on the
+                # site next changes, such as a post going live.
+                change = next_visibility_change()
+                if change is not None:
+                    timeout = min(timeout, change)
+                _cache_set = lambda r: cache_set(cache_key,
+                                                 _pack_response(r, request),
+                                                 timeout)
+                if callable(getattr(response, "render", None)):
+                    response.add_post_render_callback(_cache_set)
+                else:
+                    _cache_set(response)
             else:
-                _cache_set(response)
+                # The response won't be cached, so let go of the lease
+                # for regenerating it, so that other requests waiting
+                # for it can stop waiting.
+                cache_release(cache_key)
 
         # Second phase rendering for non-cached template code and
         # content. Split on the delimiter the ``nevercache`` tag
         # wrapped its contents in, and render only the content
         # enclosed by it, to avoid possible template code injection.
-        parts = response.content.split(nevercache_token())
-        if response["content-type"].startswith("text") and len(parts) > 1:
+        # Responses without any ``nevercache`` content are left as is.
+        if not response.get("content-type", "").startswith("text"):
+            return response
+        segments = _response_segments(response)
+        if len(segments) > 1:
             # Restore csrf token from cookie - check the response
             # first as it may be being set for the first time.
             csrf_token = None
@@ -154,10 +352,13 @@ class UpdateCacheMiddleware(object):
             if csrf_token:
                 request.META["CSRF_COOKIE"] = csrf_token
             context = RequestContext(request)
-            for i, part in enumerate(parts):
+            parts = []
+            for i, segment in enumerate(segments):
                 if i % 2:
-                    part = Template(part).render(context).encode("utf-8")
-                parts[i] = part
+                    source_hash, source = segment
+                    template = nevercache_template(source, source_hash)
+                    segment = template.render(context).encode("utf-8")
+                parts.append(segment)
             response.content = "".join(parts)
             response["Content-Length"] = len(response.content)
             # Required to clear out user messages.
@@ -181,16 +382,36 @@ class FetchFromCacheMiddleware(object):
         if (cache_installed() and request.method == "GET" and
             not request.user.is_authenticated()):
             cache_key = cache_key_prefix(request) + request.get_full_path()
-            response = cache_get(cache_key)
+            packed = cache_get(cache_key, wait=True)
+            response = None
+            if packed is not None:
+                response = _unpack_response(packed, request)
+            # If any of the response's cache tags have been bumped
+            # since it was rendered, it's stale. In this case the
+            # request that acquires the lease for regenerating the
+            # response treats it as a cache miss, and all other
+            # requests are given the stale response in the meantime.
+            if (response is not None and response._cache_tags and
+                cache_tags_bumped(response._cache_tags,
+                                  response._cache_started) and
+                cache_lease(cache_key)):
+                response = None
             if response is None:
                 request._update_cache = True
+                request._cache_tags = set()
+                request._cache_started = time()
             else:
+                # Answer conditional GETs straight from cache, without
+                # any of the work required for rendering the response.
+                not_modified = _not_modified(request, response)
+                if not_modified is not None:
+                    return not_modified
                 csrf_mw_name = "django.middleware.csrf.CsrfViewMiddleware"
                 if csrf_mw_name in settings.MIDDLEWARE_CLASSES:
                     csrf_mw = CsrfViewMiddleware()
                     csrf_mw.process_view(request, lambda x: None, None, None)
                     get_token(request)
-                return HttpResponse(response)
+                return response
 
 
 class SSLRedirectMiddleware(object):
@@ -1,16 +1,21 @@
 from django.contrib.contenttypes.generic import GenericForeignKey
 from django.db import models
 from django.db.models.base import ModelBase
-from django.db.models.signals import post_save
+from django.db.models.signals import class_prepared, m2m_changed
+from django.db.models.signals import post_delete, post_init, post_save
+from django.db.models.signals import pre_save
 from django.template.defaultfilters import truncatewords_html
 from django.utils.html import strip_tags
 from django.utils.timesince import timesince
 from django.utils.timezone import now
 from django.utils.translation import ugettext, ugettext_lazy as _
 
-from mezzanine.core.fields import RichTextField
+from mezzanine.core.fields import RichTextField, SearchVectorField
 from mezzanine.core.managers import DisplayableManager, CurrentSiteManager
+from mezzanine.core.search import get_search_backend
 from mezzanine.generic.fields import KeywordsField
+from mezzanine.utils.cache import (add_cache_tags, bump_cache_tags,
+                                   instance_cache_tag, model_cache_tag)
 from mezzanine.utils.html import TagCloser
 from mezzanine.utils.models import base_concrete_model, get_user_model_name
 from mezzanine.utils.sites import current_site_id
@@ -188,6 +193,13 @@ class Displayable(Slugged, MetaData):
     objects = DisplayableManager()
     search_fields = {"keywords": 10, "title": 5}
 
+    # Fields that determine where items are listed, such as in menus,
+    # archives and sidebars, and not just what their own pages show.
+    # Changing any of these bumps the cache tag for the item's model,
+    # whereas other changes only bump the cache tag for the item.
+    listing_fields = ("title", "slug", "status", "publish_date",
+                      "expiry_date", "site")
+
     class Meta:
         abstract = True
 
@@ -416,6 +428,48 @@ class SitePermission(models.Model):
         verbose_name_plural = _("Site permissions")
 
 
+class SearchDocument(models.Model):
+    """
+    An instance of a model that subclasses ``Displayable``, stored in
+    the search index maintained by
+    ``mezzanine.core.search.IndexSearchBackend``. The content type is
+    that of the base concrete model, eg ``Page`` for each type of page.
+    With ``mezzanine.core.search.PostgresSearchBackend``, the instance's
+    search fields are stored as a weighted ``tsvector`` instead.
+
+    The instance's own content type, site, and the fields that
+    determine whether it's published are copied to the document, so
+    that searches across models can be performed against the
+    documents alone.
+    """
+
+    content_type = models.ForeignKey("contenttypes.ContentType")
+    object_pk = models.IntegerField()
+    vector = SearchVectorField(null=True, editable=False)
+    object_type = models.ForeignKey("contenttypes.ContentType", null=True,
+                                    related_name="+")
+    site = models.ForeignKey("sites.Site", null=True)
+    status = models.IntegerField(null=True)
+    publish_date = models.DateTimeField(null=True)
+    expiry_date = models.DateTimeField(null=True)
+    login_required = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ("content_type", "object_pk")
+
+
+class SearchTerm(models.Model):
+    """
+    A word in the search fields of a ``SearchDocument``, with its
+    weight being its number of occurrences multiplied by the weight
+    of the search fields it occurs in.
+    """
+
+    document = models.ForeignKey(SearchDocument, related_name="terms")
+    term = models.CharField(max_length=100, db_index=True)
+    weight = models.IntegerField()
+
+
 def create_site_permission(sender, **kw):
     sender_name = "%s.%s" % (sender._meta.app_label, sender._meta.object_name)
     if sender_name.lower() != user_model_name.lower():
@@ -430,3 +484,138 @@ def create_site_permission(sender, **kw):
 # user models, everything explodes. So we check the name of it in
 # the signal.
 post_save.connect(create_site_permission)
+
+
+# Marks the values of fields that were deferred when an instance was
+# loaded, which never compare equal to the values they're saved with.
+_deferred = object()
+
+
+def _listing_values(instance):
+    """
+    Returns the values of the ``listing_fields`` of a ``Displayable``
+    instance, without loading any that are deferred.
+    """
+    values = instance.__dict__
+    return [values.get(name, _deferred) for name in instance._listing_attnames]
+
+
+def _displayable_cache_tags(sender, pks, listed):
+    """
+    Returns the cache tags to bump for the given ``Displayable`` model
+    and primary keys, for the model and each of its concrete parents.
+    The tags for the models themselves are only included if the
+    changes may affect where their items are listed.
+    """
+    sender = sender._meta.concrete_model
+    tags = [model_cache_tag(Displayable)]
+    for model in [sender] + list(sender._meta.get_parent_list()):
+        if listed:
+            tags.append(model_cache_tag(model))
+        tags.extend(["%s.%s" % (model_cache_tag(model), pk) for pk in pks])
+    return tags
+
+
+def add_displayable_cache_tag(sender, instance, **kw):
+    """
+    Records the cache tag for each ``Displayable`` instance loaded
+    while a response is being rendered for the cache middleware, and
+    keeps the values of its ``listing_fields`` so that
+    ``bump_displayable_cache_tags`` can tell if they change.
+    """
+    if instance.pk is not None:
+        add_cache_tags(instance_cache_tag(instance))
+        instance._listing_values = _listing_values(instance)
+
+
+def bump_displayable_cache_tags(sender, instance, **kw):
+    """
+    Bumps the cache tags for a ``Displayable`` instance when it's
+    saved or deleted, so that any cached responses containing it are
+    regenerated. The tags for its model and each of the model's
+    concrete parents are only bumped when the instance is created or
+    deleted, or any of its ``listing_fields`` change, so that editing
+    an item's content doesn't invalidate every listing of its model.
+    The tag for ``Displayable`` itself is always bumped, which
+    versions content that depends on every item, such as cached
+    search results.
+    """
+    listed = kw.get("created", True)
+    values = _listing_values(instance)
+    if values != getattr(instance, "_listing_values", None):
+        listed = True
+    instance._listing_values = values
+    bump_cache_tags(*_displayable_cache_tags(sender, [instance.pk], listed))
+
+
+def bump_displayable_m2m_cache_tags(sender, instance, action, reverse,
+                                    pk_set, **kw):
+    """
+    Bumps the cache tags for a ``Displayable`` model and the instances
+    involved when the many-to-many relations of its instances change,
+    such as the categories of blog posts, since ``post_save`` isn't
+    sent for them.
+    """
+    if action.startswith("post_"):
+        pks = list(pk_set or []) if reverse else [instance.pk]
+        model = sender._meta.auto_created
+        bump_cache_tags(*_displayable_cache_tags(model, pks, True))
+
+
+def set_publish_date(sender, instance, **kw):
+    """
+    Sets ``publish_date`` for ``Displayable`` instances saved without
+    one and without ``Displayable.save`` being called, such as those
+    loaded from fixtures, so that ``PublishedManager.published`` can
+    rely on it being set.
+    """
+    if instance.publish_date is None:
+        instance.publish_date = now()
+
+
+def index_displayable(sender, instance, **kw):
+    """
+    Updates the search index for a ``Displayable`` instance when it's
+    saved. When a page is saved via the base ``Page`` model, such as
+    when it's moved with ``set_parent``, its content model's instance
+    is indexed instead, since the page's search document and terms
+    belong to that model.
+    """
+    content_model = getattr(instance, "content_model", None)
+    if content_model and content_model != instance._meta.object_name.lower():
+        instance = instance.get_content_model() or instance
+    get_search_backend().index(instance)
+
+
+def unindex_displayable(sender, instance, **kw):
+    """
+    Removes a ``Displayable`` instance from the search index when it's
+    deleted.
+    """
+    get_search_backend().unindex(instance)
+
+
+def connect_displayable_signals(sender, **kw):
+    """
+    Connects the signal handlers for ``Displayable`` models to each
+    concrete subclass as it's prepared, rather than to every model,
+    so that they don't run when instances of other models are loaded
+    or saved. The intermediary models created for the many-to-many
+    fields of ``Displayable`` subclasses are connected too.
+    """
+    if issubclass(sender, Displayable):
+        sender._listing_attnames = [sender._meta.get_field(name).attname
+                                    for name in sender.listing_fields]
+        post_init.connect(add_displayable_cache_tag, sender=sender)
+        pre_save.connect(set_publish_date, sender=sender)
+        post_save.connect(bump_displayable_cache_tags, sender=sender)
+        post_delete.connect(bump_displayable_cache_tags, sender=sender)
+        post_save.connect(index_displayable, sender=sender)
+        post_delete.connect(unindex_displayable, sender=sender)
+    else:
+        auto_created = sender._meta.auto_created
+        if auto_created and issubclass(auto_created, Displayable):
+            m2m_changed.connect(bump_displayable_m2m_cache_tags,
+                                sender=sender)
+
+class_prepared.connect(connect_displayable_signals)
@@ -14,14 +14,18 @@ def current_request():
 
 class CurrentRequestMiddleware(object):
     """
-    Stores the request in the current thread for global access.
+    Stores the request in the current thread for global access, for
+    as long as the request is being handled, so that it isn't kept
+    alive by the thread, or mistaken for the current request by code
+    running outside of a request, once the response is returned.
+    The request isn't cleared when an exception is raised, since the
+    error response is rendered for the request's site, and is then
+    passed to ``process_response`` like any other.
     """
 
     def process_request(self, request):
         _thread_local.request = request
 
-    # def process_response(self, request, response):
-    #     try:
-    #         return response
-    #     finally:
-    #         _thread_local.request = None
+    def process_response(self, request, response):
+        _thread_local.request = None
+        return response
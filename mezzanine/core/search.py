@@ -0,0 +1,860 @@
+"""
+Search backends used by ``SearchableQuerySet.search``. The backend
+used is defined by the ``SEARCH_BACKEND`` setting.
+"""
+
+from hashlib import md5
+from operator import ior, iand
+import re
+from string import punctuation
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.db.models import FieldDoesNotExist, Q
+from django.utils.html import strip_tags
+from django.utils.timezone import now
+
+from mezzanine.conf import settings
+from mezzanine.utils.cache import add_cache_tags, cache_get, cache_installed
+from mezzanine.utils.cache import cache_set, cache_tag_versions
+from mezzanine.utils.cache import cache_user_class, model_cache_tag
+from mezzanine.utils.importing import import_dotted_path
+from mezzanine.utils.sites import current_site_id
+
+
+# Maximum length of a term stored in the search index.
+SEARCH_TERM_MAX_LENGTH = 100
+
+_word_re = re.compile(r"\w+", re.UNICODE)
+
+
+def parse_query(query):
+    """
+    Returns the list of terms in the given search query, treating
+    quoted terms as exact phrases, with each term prefixed with the
+    + or - modifier it was given, along with the list of positive
+    terms, which are those without the - modifier, lowercased and
+    without their modifiers.
+    """
+    # Remove extra spaces, put modifiers inside quoted terms.
+    terms = " ".join(query.split()).replace("+ ", "+")     \
+                                   .replace('+"', '"+')    \
+                                   .replace("- ", "-")     \
+                                   .replace('-"', '"-')    \
+                                   .split('"')
+    # Strip punctuation other than modifiers from terms and create
+    # terms list, first from quoted terms and then remaining words.
+    terms = [("" if t[0:1] not in "+-" else t[0:1]) + t.strip(punctuation)
+        for t in terms[1::2] + "".join(terms[::2]).split()]
+    # Remove stop words from terms that aren't quoted or use
+    # modifiers, since words with these are an explicit part of
+    # the search query. If doing so ends up with an empty term
+    # list, then keep the stop words.
+    terms_no_stopwords = [t for t in terms if t.lower() not in
+        settings.STOP_WORDS]
+    get_positive_terms = lambda terms: [t.lower().strip(punctuation)
+        for t in terms if t[0:1] != "-"]
+    positive_terms = get_positive_terms(terms_no_stopwords)
+    if positive_terms:
+        terms = terms_no_stopwords
+    else:
+        positive_terms = get_positive_terms(terms)
+    return terms, positive_terms
+
+
+def split_words(text):
+    """
+    Returns the lowercased words in the given text, ignoring any HTML
+    tags and punctuation. Used for both indexing content and looking
+    up the terms in a search query.
+    """
+    if not text:
+        return []
+    words = _word_re.findall(strip_tags(unicode(text)).lower())
+    return [w for w in words if len(w) <= SEARCH_TERM_MAX_LENGTH]
+
+
+def _document_content_type(model):
+    """
+    Returns the content type that ``SearchDocument`` instances are
+    stored against for the given model, which is the base concrete
+    model for subclasses of ``Displayable``, so that pages can be
+    searched across all of their content types.
+    """
+    from mezzanine.core.models import Displayable
+    for cls in reversed(model.__mro__):
+        if issubclass(cls, Displayable) and not cls._meta.abstract:
+            return ContentType.objects.get_for_model(cls)
+
+
+def _ranked(queryset, sql, params):
+    """
+    Returns the given queryset with the given SQL selected as the
+    ``result_count`` attribute of each result, and ordered by it.
+    """
+    queryset = queryset.extra(select={"result_count": sql},
+                              select_params=params)
+    return queryset.order_by("-result_count")
+
+
+def _instances(results):
+    """
+    Takes a list of ranked results, each a tuple of a content type ID,
+    primary key and ``result_count``, and returns the instances for
+    them in the same order, with their ``result_count`` attribute set.
+    The instances are retrieved with one query per model, and results
+    for instances that no longer exist are skipped.
+    """
+    pks = {}
+    for (content_type_id, pk, result_count) in results:
+        pks.setdefault(content_type_id, []).append(pk)
+    instances = {}
+    for (content_type_id, model_pks) in pks.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        for instance in model._default_manager.filter(pk__in=model_pks):
+            instances[(content_type_id, instance.pk)] = instance
+    found = []
+    for (content_type_id, pk, result_count) in results:
+        instance = instances.get((content_type_id, pk))
+        if instance is not None:
+            instance.result_count = result_count
+            found.append(instance)
+    return found
+
+
+class SearchResults(object):
+    """
+    Lazy sequence of the results of searching across several models,
+    as performed by ``SearchableManager.search`` when searching an
+    abstract model. Each model's queryset is ranked by the database,
+    so when a slice of the results is requested, such as a page of
+    results, only that many results are retrieved from each model,
+    and are then merged by ``result_count``.
+    """
+
+    def __init__(self, querysets):
+        self.querysets = querysets
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = sum([qs.count() for qs in self.querysets])
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __nonzero__(self):
+        return self.count() > 0
+
+    def _merged(self, stop=None):
+        """
+        Returns a list of the results up to the given index, across
+        all models, ordered by ``result_count``.
+        """
+        results = []
+        for i, queryset in enumerate(self.querysets):
+            if stop is not None:
+                queryset = queryset[:stop]
+            results.extend([(-r.result_count, i, j, r)
+                            for (j, r) in enumerate(queryset)])
+        results.sort()
+        return [r[-1] for r in results[:stop]]
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            if k.stop is None or k.stop < 0 or (k.start or 0) < 0:
+                return self._merged()[k]
+            return self._merged(k.stop)[k]
+        if k < 0:
+            return self._merged()[k]
+        return self._merged(k + 1)[k]
+
+    def __iter__(self):
+        return iter(self._merged())
+
+
+class DocumentSearchResults(object):
+    """
+    Lazy sequence of the results of searching across several models
+    via their ``SearchDocument`` instances, as performed by
+    ``DocumentSearchBackend.search_documents``. Counting or slicing
+    the results performs a single query against the ranked documents,
+    and the instances for the documents in a slice are then retrieved
+    with one query per model.
+    """
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def count(self):
+        return self.documents.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __nonzero__(self):
+        return self.documents.exists()
+
+    def _instances(self, documents):
+        return _instances([(d.object_type_id, d.object_pk, d.result_count)
+                           for d in documents])
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return self._instances(self.documents[k])
+        return self._instances(self.documents[k:k + 1])[0]
+
+    def __iter__(self):
+        return iter(self._instances(self.documents))
+
+
+class CachedSearchResults(object):
+    """
+    Lazy sequence of search results stored in cache by
+    ``cached_search``, as a ranked list of content type IDs, primary
+    keys and ``result_count`` values. Only the instances in a slice
+    of the results are retrieved, with one query per model.
+    """
+
+    def __init__(self, results):
+        self.results = results
+
+    def count(self):
+        return len(self.results)
+
+    def __len__(self):
+        return self.count()
+
+    def __nonzero__(self):
+        return self.count() > 0
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return _instances(self.results[k])
+        return _instances([self.results[k]])[0]
+
+    def __iter__(self):
+        return iter(_instances(self.results))
+
+
+def ranked_results(results):
+    """
+    Returns the ranked list of content type IDs, primary keys and
+    ``result_count`` values for the given results of
+    ``SearchableManager.search``, without retrieving the instances.
+    """
+    if isinstance(results, DocumentSearchResults):
+        return list(results.documents.values_list("object_type",
+                                                  "object_pk",
+                                                  "result_count"))
+    querysets = getattr(results, "querysets", [results])
+    ranked = []
+    for queryset in querysets:
+        content_type_id = ContentType.objects.get_for_model(queryset.model).id
+        ranked.extend([(-result_count, content_type_id, pk) for
+                       (pk, result_count) in
+                       queryset.values_list("pk", "result_count")])
+    if len(querysets) > 1:
+        ranked.sort()
+    return [(content_type_id, pk, -result_count) for
+            (result_count, content_type_id, pk) in ranked]
+
+
+def search_cache_key(model, query, for_user=None):
+    """
+    Returns the cache key for the results of searching the given
+    model for the given query, which depends on the query's terms,
+    the class of user searching, since staff can search unpublished
+    content and unauthenticated users can't search content that
+    requires login, and the version of the ``Displayable`` cache
+    tag, which is bumped whenever any ``Displayable`` is saved or
+    deleted.
+    """
+    from mezzanine.core.models import Displayable
+    terms = "\n".join(sorted(set([t.lower() for t in parse_query(query)[0]])))
+    tag = model_cache_tag(Displayable)
+    version = cache_tag_versions([tag]).get(tag, 0)
+    key = "%s.search.%s.%s.%s.%r.%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX,
+        current_site_id(), model_cache_tag(model), cache_user_class(for_user),
+        version, terms)
+    return md5(key.encode("utf-8")).hexdigest()
+
+
+def cached_search(model, query, for_user=None):
+    """
+    Searches the given model for the given query, as with
+    ``SearchableManager.search``, storing the ranked results in cache
+    when the cache is installed, so that repeated searches and each
+    page of their results don't perform the search again. The tag
+    for ``Displayable`` is recorded against the current request, since
+    the results change whenever the content of any item does.
+    """
+    from mezzanine.core.models import Displayable
+    add_cache_tags(model_cache_tag(Displayable))
+    if not cache_installed():
+        return model.objects.search(query, for_user=for_user)
+    cache_key = search_cache_key(model, query, for_user)
+    results = cache_get(cache_key)
+    if results is None:
+        results = model.objects.search(query, for_user=for_user)
+        results = ranked_results(results)
+        cache_set(cache_key, results)
+    return CachedSearchResults(results)
+
+
+_backends = {}
+
+
+def get_search_backend():
+    """
+    Returns the search backend instance defined by the
+    ``SEARCH_BACKEND`` setting.
+    """
+    path = settings.SEARCH_BACKEND
+    try:
+        return _backends[path]
+    except KeyError:
+        backend = _backends[path] = import_dotted_path(path)()
+        return backend
+
+
+class DatabaseSearchBackend(object):
+    """
+    Search backend that matches each term against each search field
+    with ``icontains`` lookups, and ranks results by counting the
+    occurrences of each term in each search field. Requires no index,
+    but each search scans every row of the model's table.
+    """
+
+    def search(self, queryset, terms):
+        """
+        Returns the given queryset filtered by the given terms, as
+        returned by ``parse_query``.
+        """
+        fields = queryset._search_fields.keys()
+        excluded = [reduce(iand, [~Q(**{"%s__icontains" % f: t[1:]})
+            for f in fields]) for t in terms if t[0:1] == "-"]
+        required = [reduce(ior, [Q(**{"%s__icontains" % f: t[1:]})
+            for f in fields]) for t in terms if t[0:1] == "+"]
+        optional = [reduce(ior, [Q(**{"%s__icontains" % f: t})
+            for f in fields]) for t in terms if t[0:1] not in "+-"]
+        if excluded:
+            queryset = queryset.filter(reduce(iand, excluded))
+        if required:
+            queryset = queryset.filter(reduce(iand, required))
+        # Optional terms aren't relevant to the filter if there are
+        # terms that are explicitly required.
+        elif optional:
+            queryset = queryset.filter(reduce(ior, optional))
+        return queryset
+
+    def rank(self, queryset):
+        """
+        Returns the given queryset with each result given a
+        ``result_count`` attribute, being the weighted number of
+        occurrences of the search terms in its search fields, and
+        ordered by it. The count is calculated by the database, using
+        the difference in length between each field and the field
+        with each term removed.
+        """
+        qn = connection.ops.quote_name
+        length = "CHAR_LENGTH" if connection.vendor == "mysql" else "LENGTH"
+        counts = []
+        params = []
+        for (name, weight) in queryset._search_fields.items():
+            try:
+                field = queryset.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                # Fields spanning relationships can be searched, but
+                # aren't counted.
+                continue
+            column = "COALESCE(%s.%s, '')" % (qn(field.model._meta.db_table),
+                                              qn(field.column))
+            for term in queryset._search_terms:
+                counts.append("(%s(%s) - %s(REPLACE(LOWER(%s), %%s, ''))) "
+                              "/ %s * %s" % (length, column, length, column,
+                                             len(term), int(weight)))
+                params.append(term)
+        return _ranked(queryset, " + ".join(counts) or "0", params)
+
+    def index(self, instance):
+        """
+        Called when a ``Displayable`` instance is saved. No index is
+        used by this backend.
+        """
+        pass
+
+    def unindex(self, instance):
+        """
+        Called when a ``Displayable`` instance is deleted. No index
+        is used by this backend.
+        """
+        pass
+
+
+class DocumentSearchBackend(DatabaseSearchBackend):
+    """
+    Base class for search backends that store a ``SearchDocument``
+    for each ``Displayable`` instance. Along with the index itself,
+    each document stores a copy of the instance's site and the
+    fields used to determine whether it's published, so that
+    searching across several models, such as searching via the
+    abstract ``Displayable`` model, can be performed with a single
+    query against the documents. Only the instances in the slice of
+    results requested are then retrieved, with one query per model.
+
+    Subclasses implement ``search``, ``rank`` and ``index`` for
+    searching a single model, as with ``DatabaseSearchBackend``, and
+    the following methods for searching across models, without which
+    each model is searched separately:
+
+      - ``filter_documents(documents, terms)``: returns the given
+        ``SearchDocument`` queryset filtered by the given terms, as
+        returned by ``parse_query``, which contain no phrases.
+      - ``rank_documents(documents, terms)``: returns the given
+        ``SearchDocument`` queryset with each document given a
+        ``result_count`` attribute for the given positive terms,
+        and ordered by it.
+
+    """
+
+    def _indexed(self, model):
+        from mezzanine.core.models import Displayable
+        return issubclass(model, Displayable)
+
+    def update_document(self, instance):
+        """
+        Creates or updates the ``SearchDocument`` for the given
+        instance, and returns it.
+        """
+        from mezzanine.core.models import SearchDocument
+        fields = {
+            "object_type": ContentType.objects.get_for_model(instance),
+            "site_id": instance.site_id,
+            "status": instance.status,
+            "publish_date": instance.publish_date,
+            "expiry_date": instance.expiry_date,
+            "login_required": getattr(instance, "login_required", False),
+        }
+        document, created = SearchDocument.objects.get_or_create(
+            content_type=_document_content_type(instance.__class__),
+            object_pk=instance.pk, defaults=fields)
+        if not created:
+            # The document isn't saved via the ORM, since that would
+            # also write its ``vector`` field. Updates take the name of
+            # the site field rather than its column.
+            fields["site"] = fields.pop("site_id")
+            SearchDocument.objects.filter(id=document.id).update(**fields)
+        return document
+
+    def unindex(self, instance):
+        """
+        Removes the given instance from the index.
+        """
+        if self._indexed(instance.__class__):
+            from mezzanine.core.models import SearchDocument
+            content_type = _document_content_type(instance.__class__)
+            SearchDocument.objects.filter(content_type=content_type,
+                                          object_pk=instance.pk).delete()
+
+    def search_documents(self, models, query, search_fields=None,
+                         for_user=None):
+        """
+        Searches across the given models with a single query against
+        their documents, returning a lazy ``DocumentSearchResults``.
+        Returns ``None`` if the search can't be performed this way,
+        which is the case when any of the models aren't indexed,
+        specific search fields are given, or the query contains
+        phrases, since these need to be matched against the content
+        of each model, or when the backend doesn't implement
+        ``filter_documents`` and ``rank_documents``.
+        """
+        from mezzanine.core.models import CONTENT_STATUS_PUBLISHED
+        from mezzanine.core.models import SearchDocument
+        if search_fields or not all([self._indexed(m) for m in models]):
+            return None
+        if not (hasattr(self, "filter_documents") and
+                hasattr(self, "rank_documents")):
+            return None
+        terms, positive_terms = parse_query(query)
+        if [t for t in terms if len(split_words(t)) > 1]:
+            return None
+        object_types = [ContentType.objects.get_for_model(m) for m in models]
+        documents = SearchDocument.objects.filter(site=current_site_id(),
+            object_type__in=object_types)
+        if for_user is None or not for_user.is_staff:
+            documents = documents.filter(
+                Q(publish_date__lte=now()) | Q(publish_date__isnull=True),
+                Q(expiry_date__gte=now()) | Q(expiry_date__isnull=True),
+                Q(status=CONTENT_STATUS_PUBLISHED))
+        unauthenticated = for_user and not for_user.is_authenticated()
+        if unauthenticated and not getattr(settings,
+                "PAGES_PUBLISHED_INCLUDE_LOGIN_REQUIRED", True):
+            documents = documents.exclude(login_required=True)
+        if not positive_terms:
+            return DocumentSearchResults(documents.none())
+        documents = self.filter_documents(documents, terms)
+        documents = self.rank_documents(documents, positive_terms)
+        return DocumentSearchResults(documents)
+
+
+class IndexSearchBackend(DocumentSearchBackend):
+    """
+    Search backend that maintains an inverted index of the words in
+    the search fields of each ``Displayable`` instance, stored as
+    ``SearchDocument`` instances for each ``Displayable`` instance,
+    and ``SearchTerm`` instances for each word found in it, weighted
+    by the weights of the search fields the word occurs in. Searches
+    then only look up the index for the words searched for, rather
+    than scanning the content of every row.
+
+    Unlike ``DatabaseSearchBackend``, words in the search query only
+    match whole words in the content. Quoted phrases match content
+    containing each word in the phrase according to the index, which
+    is then also matched against the phrase itself.
+
+    Models that don't subclass ``Displayable`` aren't indexed, and
+    are searched with ``DatabaseSearchBackend``.
+    """
+
+    def _postings(self, queryset, words):
+        """
+        Returns the ``SearchTerm`` instances for the queryset's model
+        and the given words.
+        """
+        from mezzanine.core.models import SearchTerm
+        return SearchTerm.objects.filter(term__in=words,
+            document__content_type=_document_content_type(queryset.model))
+
+    def _matching(self, queryset, words):
+        """
+        Returns a subquery of the IDs of indexed instances containing
+        any of the given words.
+        """
+        postings = self._postings(queryset, words)
+        return postings.values("document__object_pk")
+
+    def search(self, queryset, terms):
+        """
+        Returns the given queryset filtered by the IDs of the indexed
+        instances matching the given terms. Phrases are also matched
+        with ``icontains`` lookups, which are only applied to the
+        instances matching each word in the phrase.
+        """
+        if not self._indexed(queryset.model):
+            parent = super(IndexSearchBackend, self)
+            return parent.search(queryset, terms)
+        fields = queryset._search_fields.keys()
+        matching = lambda words: Q(pk__in=self._matching(queryset, words))
+        excluded, required, optional, optional_words = [], [], [], []
+        for term in terms:
+            modifier = term[0:1] if term[0:1] in "+-" else ""
+            phrase = term[len(modifier):]
+            words = split_words(phrase)
+            if not words:
+                continue
+            if len(words) == 1:
+                if not modifier:
+                    optional_words.extend(words)
+                    continue
+                condition = matching(words)
+            else:
+                condition = reduce(iand, [matching([w]) for w in words])
+                condition &= reduce(ior, [Q(**{"%s__icontains" % f: phrase})
+                                          for f in fields])
+            {"-": excluded, "+": required, "": optional}[modifier].append(
+                condition)
+        if optional_words:
+            optional.append(matching(optional_words))
+        for condition in excluded:
+            queryset = queryset.exclude(condition)
+        # As with ``DatabaseSearchBackend``, optional terms aren't
+        # relevant to the filter if there are terms that are
+        # explicitly required.
+        if required:
+            queryset = queryset.filter(reduce(iand, required))
+        elif optional:
+            queryset = queryset.filter(reduce(ior, optional))
+        return queryset
+
+    def rank(self, queryset):
+        """
+        Returns the given queryset with each result given a
+        ``result_count`` attribute, being the total weight of the
+        search terms in the index for it, and ordered by it.
+        """
+        if not self._indexed(queryset.model):
+            return super(IndexSearchBackend, self).rank(queryset)
+        from mezzanine.core.models import SearchDocument, SearchTerm
+        qn = connection.ops.quote_name
+        words = set()
+        for term in queryset._search_terms:
+            words.update(split_words(term))
+        if not words:
+            return _ranked(queryset, "0", [])
+        opts = queryset.model._meta
+        sql = ("COALESCE((SELECT SUM(t.%(weight)s) FROM %(terms)s t "
+               "INNER JOIN %(documents)s d ON t.%(document)s = d.%(id)s "
+               "WHERE d.%(content_type)s = %%s "
+               "AND d.%(object_pk)s = %(table)s.%(pk)s "
+               "AND t.%(term)s IN (%(words)s)), 0)") % {
+            "weight": qn("weight"),
+            "terms": qn(SearchTerm._meta.db_table),
+            "documents": qn(SearchDocument._meta.db_table),
+            "document": qn("document_id"),
+            "id": qn("id"),
+            "content_type": qn("content_type_id"),
+            "object_pk": qn("object_pk"),
+            "table": qn(opts.db_table),
+            "pk": qn(opts.pk.column),
+            "term": qn("term"),
+            "words": ", ".join(["%s"] * len(words)),
+        }
+        params = [_document_content_type(queryset.model).id] + list(words)
+        return _ranked(queryset, sql, params)
+
+    def get_terms(self, instance):
+        """
+        Returns a dict mapping each word in the given instance's
+        search fields, to its number of occurrences multiplied by the
+        weight of the fields it occurs in.
+        """
+        terms = {}
+        search_fields = instance.__class__.objects.get_search_fields()
+        for (field, weight) in search_fields.items():
+            for word in split_words(getattr(instance, field, "")):
+                terms[word] = terms.get(word, 0) + weight
+        return terms
+
+    def index(self, instance):
+        """
+        Replaces the terms stored in the index for the given instance.
+        """
+        from mezzanine.core.models import SearchTerm
+        document = self.update_document(instance)
+        document.terms.all().delete()
+        SearchTerm.objects.bulk_create([
+            SearchTerm(document=document, term=term, weight=weight)
+            for (term, weight) in self.get_terms(instance).items()])
+
+    def filter_documents(self, documents, terms):
+        """
+        Returns the given ``SearchDocument`` queryset filtered by the
+        IDs of the documents containing the given terms.
+        """
+        from mezzanine.core.models import SearchTerm
+        matching = lambda words: Q(id__in=SearchTerm.objects.filter(
+            term__in=words).values("document"))
+        words = dict([(m, []) for m in ("", "+", "-")])
+        for term in terms:
+            modifier = term[0:1] if term[0:1] in "+-" else ""
+            words[modifier].extend(split_words(term[len(modifier):]))
+        for word in words["-"]:
+            documents = documents.exclude(matching([word]))
+        if words["+"]:
+            documents = documents.filter(
+                reduce(iand, [matching([w]) for w in words["+"]]))
+        elif words[""]:
+            documents = documents.filter(matching(words[""]))
+        return documents
+
+    def rank_documents(self, documents, terms):
+        """
+        Returns the given ``SearchDocument`` queryset with each
+        document given a ``result_count`` attribute, being the total
+        weight of the given terms in it, and ordered by it.
+        """
+        from mezzanine.core.models import SearchDocument, SearchTerm
+        qn = connection.ops.quote_name
+        words = set()
+        for term in terms:
+            words.update(split_words(term))
+        if not words:
+            return _ranked(documents, "0", [])
+        sql = ("COALESCE((SELECT SUM(t.%s) FROM %s t WHERE t.%s = %s.%s "
+               "AND t.%s IN (%s)), 0)" % (qn("weight"),
+               qn(SearchTerm._meta.db_table), qn("document_id"),
+               qn(SearchDocument._meta.db_table), qn("id"), qn("term"),
+               ", ".join(["%s"] * len(words))))
+        return _ranked(documents, sql, list(words))
+
+
+class PostgresSearchBackend(DocumentSearchBackend):
+    """
+    Search backend that uses PostgreSQL's full-text search, storing
+    the search fields of each ``Displayable`` instance as a weighted
+    ``tsvector`` on its ``SearchDocument``, indexed with a GIN index.
+    Search fields are given the weights A to D, in order of their
+    weights in ``search_fields``, with any beyond the fourth highest
+    weight given D. Results are ranked with ``ts_rank``.
+
+    Words in the search query are converted with ``plainto_tsquery``,
+    so they match any form of the word, according to the text search
+    configuration given by ``config``. Required and excluded terms
+    are combined with the ``&&`` and ``!!`` operators, and phrases
+    match content containing each word in the phrase, which is also
+    matched against the phrase itself when required or excluded.
+
+    On other databases, and for models that don't subclass
+    ``Displayable``, ``DatabaseSearchBackend`` is used.
+    """
+
+    config = "english"
+
+    def _indexed(self, model):
+        indexed = super(PostgresSearchBackend, self)._indexed(model)
+        return indexed and connection.vendor == "postgresql"
+
+    def tsquery(self, terms):
+        """
+        Returns the SQL and params for a ``tsquery`` matching the
+        given terms, as returned by ``parse_query``, along with the
+        phrases that are required or excluded, keyed by modifier. The
+        SQL is ``None`` if there are no words to match.
+        """
+        optional, required, excluded = [], [], []
+        phrases = {"+": [], "-": []}
+        for term in terms:
+            modifier = term[0:1] if term[0:1] in "+-" else ""
+            phrase = term[len(modifier):]
+            words = split_words(phrase)
+            if not words:
+                continue
+            if modifier and len(words) > 1:
+                phrases[modifier].append(phrase)
+                if modifier == "-":
+                    continue
+            {"": optional, "+": required, "-": excluded}[modifier].append(
+                " ".join(words))
+        if not optional and not required:
+            return None, [], phrases
+        sql = "plainto_tsquery(%s, %s)"
+        if required:
+            positive = " && ".join([sql] * len(required))
+            params = required
+        else:
+            positive = " || ".join([sql] * len(optional))
+            params = optional
+        negative = "".join([" && !!" + sql] * len(excluded))
+        params = [p for word in params + excluded
+                  for p in (self.config, word)]
+        return "(%s)%s" % (positive, negative), params, phrases
+
+    def search(self, queryset, terms):
+        """
+        Returns the given queryset filtered by the IDs of instances
+        whose ``tsvector`` matches the given terms.
+        """
+        if not self._indexed(queryset.model):
+            parent = super(PostgresSearchBackend, self)
+            return parent.search(queryset, terms)
+        from mezzanine.core.models import SearchDocument
+        sql, params, phrases = self.tsquery(terms)
+        if sql is None:
+            return queryset.none()
+        fields = queryset._search_fields.keys()
+        phrase_filter = lambda phrase: reduce(ior,
+            [Q(**{"%s__icontains" % f: phrase}) for f in fields])
+        documents = SearchDocument.objects.filter(
+            content_type=_document_content_type(queryset.model))
+        documents = documents.extra(where=["vector @@ " + sql],
+                                    params=params)
+        queryset = queryset.filter(pk__in=documents.values("object_pk"))
+        for phrase in phrases["+"]:
+            queryset = queryset.filter(phrase_filter(phrase))
+        for phrase in phrases["-"]:
+            queryset = queryset.exclude(phrase_filter(phrase))
+        return queryset
+
+    def rank(self, queryset):
+        """
+        Returns the given queryset with each result given a
+        ``result_count`` attribute, being the ``ts_rank`` of its
+        ``tsvector`` for the positive search terms, and ordered by it.
+        """
+        if not self._indexed(queryset.model):
+            return super(PostgresSearchBackend, self).rank(queryset)
+        from mezzanine.core.models import SearchDocument
+        qn = connection.ops.quote_name
+        words = [" ".join(split_words(t)) for t in queryset._search_terms]
+        words = [w for w in words if w]
+        if not words:
+            return _ranked(queryset, "0", [])
+        opts = queryset.model._meta
+        tsquery = " || ".join(["plainto_tsquery(%s, %s)"] * len(words))
+        sql = ("COALESCE((SELECT ts_rank(d.%(vector)s, %(tsquery)s) "
+               "FROM %(documents)s d WHERE d.%(content_type)s = %%s "
+               "AND d.%(object_pk)s = %(table)s.%(pk)s), 0)") % {
+            "vector": qn("vector"),
+            "tsquery": tsquery,
+            "documents": qn(SearchDocument._meta.db_table),
+            "content_type": qn("content_type_id"),
+            "object_pk": qn("object_pk"),
+            "table": qn(opts.db_table),
+            "pk": qn(opts.pk.column),
+        }
+        params = [p for w in words for p in (self.config, w)]
+        params.append(_document_content_type(queryset.model).id)
+        return _ranked(queryset, sql, params)
+
+    def get_weighted_text(self, instance):
+        """
+        Returns a dict mapping each of the weights A to D to the text
+        of the given instance's search fields for that weight.
+        """
+        search_fields = instance.__class__.objects.get_search_fields()
+        weights = sorted(set(search_fields.values()), reverse=True)
+        letters = dict(zip(weights, "ABCD"))
+        text = {}
+        for (field, weight) in search_fields.items():
+            value = strip_tags(unicode(getattr(instance, field, "") or ""))
+            letter = letters.get(weight, "D")
+            text[letter] = (text.get(letter, "") + " " + value).strip()
+        return text
+
+    def index(self, instance):
+        """
+        Stores the weighted ``tsvector`` for the given instance.
+        """
+        if not self._indexed(instance.__class__):
+            return
+        from mezzanine.core.models import SearchDocument
+        qn = connection.ops.quote_name
+        document = self.update_document(instance)
+        text = sorted(self.get_weighted_text(instance).items())
+        vector = " || ".join(["setweight(to_tsvector(%s, %s), %s)"] *
+                             len(text)) or "NULL"
+        params = [p for (letter, value) in text
+                  for p in (self.config, value, letter)]
+        params.append(document.id)
+        cursor = connection.cursor()
+        cursor.execute("UPDATE %s SET %s = %s WHERE %s = %%s" % (
+            qn(SearchDocument._meta.db_table), qn("vector"), vector,
+            qn("id")), params)
+        transaction.commit_unless_managed()
+
+    def filter_documents(self, documents, terms):
+        """
+        Returns the given ``SearchDocument`` queryset filtered by the
+        documents whose ``tsvector`` matches the given terms.
+        """
+        sql, params, phrases = self.tsquery(terms)
+        if sql is None:
+            return documents.none()
+        return documents.extra(where=["vector @@ " + sql], params=params)
+
+    def rank_documents(self, documents, terms):
+        """
+        Returns the given ``SearchDocument`` queryset with each
+        document given a ``result_count`` attribute, being the
+        ``ts_rank`` of its ``tsvector`` for the given terms, and
+        ordered by it.
+        """
+        words = [" ".join(split_words(t)) for t in terms]
+        words = [w for w in words if w]
+        tsquery = " || ".join(["plainto_tsquery(%s, %s)"] * len(words))
+        sql = "ts_rank(%s, %s)" % (connection.ops.quote_name("vector"),
+                                   tsquery or "NULL")
+        params = [p for w in words for p in (self.config, w)]
+        return _ranked(documents, sql, params)
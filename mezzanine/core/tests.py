@@ -1,24 +1,30 @@
 
 import os
 from shutil import rmtree
+from threading import Thread
 from urlparse import urlparse
+from time import time
 from uuid import uuid4
 
+from django.contrib.auth.models import AnonymousUser
 from django.contrib.auth.tokens import default_token_generator
+from django.contrib.messages.storage import default_storage
 from django.contrib.contenttypes.models import ContentType
 from django.core import mail
 from django.core.urlresolvers import reverse
 from django.db import connection
+from django.http import HttpResponse
 from django.template import Context, Template, TemplateDoesNotExist
 from django.template.loader import get_template
 from django.test import TestCase
+from django.test.client import RequestFactory
 from django.utils.html import strip_tags
 from django.utils.http import int_to_base36
 from django.contrib.sites.models import Site
 from PIL import Image
 
 from mezzanine.accounts import get_profile_model, get_profile_user_fieldname
-from mezzanine.blog.models import BlogPost
+from mezzanine.blog.models import BlogCategory, BlogPost
 from mezzanine.conf import settings, registry
 from mezzanine.conf.models import Setting
 from mezzanine.core.models import CONTENT_STATUS_DRAFT
@@ -31,7 +37,14 @@ from mezzanine.galleries.models import Gallery, GALLERIES_UPLOAD_DIR
 from mezzanine.generic.forms import RatingForm
 from mezzanine.generic.models import ThreadedComment, AssignedKeyword, Keyword
 from mezzanine.pages.models import Page, RichTextPage
+from mezzanine.pages.signals import subtree_changed
 from mezzanine.urls import PAGES_SLUG
+from mezzanine.utils.cache import cache_get, cache_installed, cache_set
+from mezzanine.utils.cache import cache_stats
+from mezzanine.utils.cache import cache_lease, cache_release
+from mezzanine.utils.cache import nevercache_template, nevercache_token
+from mezzanine.utils.cache import cache_tags_bumped, instance_cache_tag
+from mezzanine.utils.cache import model_cache_tag
 from mezzanine.utils.importing import import_dotted_path
 from mezzanine.utils.tests import copy_test_to_media, run_pyflakes_for_package
 from mezzanine.utils.tests import run_pep8_for_package
@@ -154,7 +167,8 @@ class Tests(TestCase):
         secondary, created = primary.children.get_or_create(title="Secondary")
         tertiary, created = secondary.children.get_or_create(title="Tertiary")
         # Force a site ID to avoid the site query when measuring queries.
-        setattr(current_request(), "site_id", settings.SITE_ID)
+        if current_request() is not None:
+            setattr(current_request(), "site_id", settings.SITE_ID)
 
         # Test that get_ascendants() returns the right thing.
         page = Page.objects.get(id=tertiary.id)
@@ -181,14 +195,14 @@ class Tests(TestCase):
 
         # Use a custom slug in the page path, and test that
         # Page.objects.with_ascendants_for_slug fails, but
-        # correctly falls back to recursive queries.
+        # correctly falls back to a single query using the page path.
         secondary.slug += "custom"
         secondary.save()
         pages_for_slug = Page.objects.with_ascendants_for_slug(tertiary.slug)
         self.assertEquals(len(pages_for_slug[0]._ascendants), 0)
         connection.queries = []
         ascendants = pages_for_slug[0].get_ascendants()
-        self.assertEqual(len(connection.queries), 2)  # 2 parent queries
+        self.assertEqual(len(connection.queries), 1)
         self.assertEqual(pages_for_slug[0].id, tertiary.id)
         self.assertEqual(ascendants[0].id, secondary.id)
         self.assertEqual(ascendants[1].id, primary.id)
@@ -244,6 +258,51 @@ class Tests(TestCase):
         with self.assertRaises(AttributeError):
             p1.set_parent(p2c)
 
+    def test_page_path(self):
+        """
+        Test the materialized path, depth and titles of pages are
+        maintained for a page and its descendants when the page is
+        renamed or moved, and that descendants are retrieved using the
+        path.
+        """
+        primary, _ = RichTextPage.objects.get_or_create(title="Primary")
+        secondary, _ = primary.children.get_or_create(title="Secondary")
+        tertiary, _ = secondary.children.get_or_create(title="Tertiary")
+        other, _ = RichTextPage.objects.get_or_create(title="Other")
+        tertiary = Page.objects.get(id=tertiary.id)
+        self.assertEqual(tertiary.path, "%s/%s/%s/" %
+                         (primary.id, secondary.id, tertiary.id))
+        self.assertEqual(tertiary.depth, 2)
+        self.assertEqual(set(primary.get_descendants()),
+                         set([secondary, tertiary]))
+        # Renaming or moving a page updates its descendants in a
+        # single query.
+        secondary.title = "Second"
+        secondary.save()
+        self.assertEqual(Page.objects.get(id=tertiary.id).titles,
+                         "Primary / Second / Tertiary")
+        secondary.parent = other
+        connection.queries = []
+        secondary.save()
+        updates = [q for q in connection.queries
+                   if q["sql"].startswith("UPDATE") and "LIKE" in q["sql"]]
+        self.assertEqual(len(updates), 1)
+        tertiary = Page.objects.get(id=tertiary.id)
+        self.assertEqual(tertiary.path, "%s/%s/%s/" %
+                         (other.id, secondary.id, tertiary.id))
+        self.assertEqual(tertiary.depth, 2)
+        self.assertEqual(tertiary.titles, "Other / Second / Tertiary")
+        self.assertEqual(list(other.get_descendants()),
+                         [secondary, tertiary])
+        self.assertFalse(primary.get_descendants().exists())
+        secondary.parent = None
+        secondary.save()
+        tertiary = Page.objects.get(id=tertiary.id)
+        self.assertEqual(tertiary.path, "%s/%s/" % (secondary.id,
+                                                    tertiary.id))
+        self.assertEqual(tertiary.depth, 1)
+        self.assertEqual(tertiary.titles, "Second / Tertiary")
+
     def test_set_slug(self):
         parent, _ = RichTextPage.objects.get_or_create(title="Parent",
                                                        slug="parent")
@@ -260,6 +319,86 @@ class Tests(TestCase):
         child = RichTextPage.objects.get(id=child.id)
         self.assertTrue(child.slug == "new-parent-slug/child")
 
+    def test_set_parent_bulk(self):
+        """
+        Test moving a subtree updates all of its pages with a fixed
+        number of queries, regardless of its size, sends a single
+        ``subtree_changed`` signal, and bumps the cache tags for each
+        of its pages and their content types.
+        """
+        section, _ = RichTextPage.objects.get_or_create(title="Section")
+        sibling, _ = RichTextPage.objects.get_or_create(title="Section 2")
+        target, _ = RichTextPage.objects.get_or_create(title="Target")
+        parent = section
+        for i in range(10):
+            parent = RichTextPage.objects.create(title="Sub %s" % i,
+                                                 parent=parent)
+        small = RichTextPage.objects.create(title="Small")
+        RichTextPage.objects.create(title="Small child", parent=small)
+        signals = []
+        receiver = lambda sender, page, **kwargs: signals.append(page)
+        subtree_changed.connect(receiver, sender=Page)
+        started = time()
+        try:
+            self.assertNumQueries(10, section.set_parent, target)
+            self.assertNumQueries(10, small.set_parent, target)
+        finally:
+            subtree_changed.disconnect(receiver, sender=Page)
+        self.assertEqual(signals, [section, small])
+        for tag in (model_cache_tag(RichTextPage), model_cache_tag(Page),
+                    instance_cache_tag(parent),
+                    "%s.%s" % (model_cache_tag(Page), parent.id)):
+            self.assertTrue(cache_tags_bumped([tag], started))
+        deepest = Page.objects.get(id=parent.id)
+        self.assertEqual(deepest.slug, "target/section/" +
+                         "/".join(["sub-%s" % i for i in range(10)]))
+        self.assertEqual(deepest.depth, 11)
+        self.assertTrue(deepest.path.startswith("%s/%s/" %
+                                                (target.id, section.id)))
+        self.assertTrue(deepest.titles.startswith("Target / Section / "))
+        self.assertEqual(Page.objects.get(id=sibling.id).slug, "section-2")
+
+    def test_set_parent_reindex(self):
+        """
+        Test moving a subtree updates the search index for its pages
+        when they're searched by fields that are updated in bulk.
+        """
+        settings.SEARCH_BACKEND = "mezzanine.core.search.IndexSearchBackend"
+        manager = RichTextPage.objects
+        search_fields = manager._search_fields
+        manager._search_fields = {"titles": 1}
+        try:
+            section = RichTextPage.objects.create(title="Section")
+            leaf = RichTextPage.objects.create(title="Leaf", parent=section)
+            target = RichTextPage.objects.create(title="Reindexed")
+            section.set_parent(target)
+            results = RichTextPage.objects.search("reindexed")
+            self.assertEqual(set([p.id for p in results]),
+                             set([target.id, section.id, leaf.id]))
+        finally:
+            manager._search_fields = search_fields
+            del settings.SEARCH_BACKEND
+
+    def test_set_parent_content_model_index(self):
+        """
+        Test moving a page via the base ``Page`` model keeps it
+        indexed by the fields of its content model.
+        """
+        from mezzanine.core.models import Displayable
+        settings.SEARCH_BACKEND = "mezzanine.core.search.IndexSearchBackend"
+        try:
+            published = {"status": CONTENT_STATUS_PUBLISHED}
+            page = RichTextPage.objects.create(title="Alpha",
+                content="<p>zebra</p>", **published)
+            target = RichTextPage.objects.create(title="Target", **published)
+            Page.objects.get(id=page.id).set_parent(target)
+            results = RichTextPage.objects.search("zebra")
+            self.assertEqual([p.id for p in results], [page.id])
+            results = Displayable.objects.search("zebra")
+            self.assertEqual([p.id for p in results], [page.id])
+        finally:
+            del settings.SEARCH_BACKEND
+
     def test_description(self):
         """
         Test generated description is text version of the first line
@@ -288,6 +427,177 @@ class Tests(TestCase):
         mobile = self.client.get(url, HTTP_USER_AGENT=ua)
         self.assertNotEqual(default.template_name[0], mobile.template_name[0])
 
+    def test_blog_months(self):
+        """
+        Test the months with published blog posts are grouped and
+        counted in the database, most recent first.
+        """
+        from datetime import datetime, timedelta
+        from django.utils.timezone import get_current_timezone
+        from django.utils.timezone import make_aware, now
+        self.clear_current_request()
+        date = lambda *args: make_aware(datetime(*args),
+                                        get_current_timezone())
+        BlogPost.objects.all().delete()
+        dates = [(2012, 1, 5), (2012, 1, 20), (2012, 3, 10), (2013, 2, 10)]
+        for args in dates:
+            BlogPost.objects.create(title="Post", user=self._user,
+                                    publish_date=date(*args),
+                                    status=CONTENT_STATUS_PUBLISHED)
+        BlogPost.objects.create(title="Draft", user=self._user,
+                                publish_date=date(2012, 1, 10),
+                                status=CONTENT_STATUS_DRAFT)
+        BlogPost.objects.create(title="Future", user=self._user,
+                                publish_date=now() + timedelta(days=60),
+                                status=CONTENT_STATUS_PUBLISHED)
+        template = ("{% load blog_tags %}{% blog_months as months %}"
+                    "{% for m in months %}{{ m.date|date:'Y-m' }}="
+                    "{{ m.post_count }} {% endfor %}")
+        connection.queries = []
+        rendered = Template(template).render(Context({}))
+        self.assertEqual(len(connection.queries), 1)
+        self.assertEqual(rendered, "2013-02=1 2012-03=1 2012-01=2 ")
+
+    def test_cached_tag_invalidation(self):
+        """
+        Test that the models cached blog tags are built from have
+        their cache tags bumped when saved, and that the next time
+        published blog posts change is found for expiring the tags.
+        """
+        from datetime import timedelta
+        from django.utils.timezone import now
+        from django.contrib.auth.models import update_last_login
+        start = time()
+        BlogCategory.objects.create(title="Cached")
+        self.assertTrue(cache_tags_bumped([model_cache_tag(BlogCategory)],
+                                          start))
+        # Logging in doesn't change anything cached tags show.
+        start = time()
+        update_last_login(None, self._user)
+        self.assertFalse(cache_tags_bumped([model_cache_tag(User)], start))
+        self._user.save()
+        self.assertTrue(cache_tags_bumped([model_cache_tag(User)], start))
+        BlogPost.objects.all().delete()
+        self.assertEqual(BlogPost.objects.next_visibility_change(), None)
+        publish_date = now() + timedelta(days=2)
+        expiry_date = now() + timedelta(days=1)
+        for (status, publish, expiry) in (
+                (CONTENT_STATUS_PUBLISHED, publish_date, None),
+                (CONTENT_STATUS_PUBLISHED, None, expiry_date),
+                (CONTENT_STATUS_DRAFT, now() + timedelta(hours=1), None)):
+            BlogPost.objects.create(title="Post", user=self._user,
+                                    status=status, publish_date=publish,
+                                    expiry_date=expiry)
+        self.assertEqual(BlogPost.objects.next_visibility_change(),
+                         expiry_date)
+
+    def test_keyset_pagination(self):
+        """
+        Test that paging forwards and backwards through blog posts
+        with keyset pagination returns each post once and in order,
+        including posts with the same publish date, and that counting
+        and positional cursors are limited by
+        ``PAGINATION_COUNT_LIMIT``.
+        """
+        from datetime import timedelta
+        from django.utils.timezone import now
+        from mezzanine.utils.views import paginate
+        BlogPost.objects.all().delete()
+        start = now() - timedelta(days=10)
+        for day in (1, 2, 2, 2, 3, 4, 4):
+            BlogPost.objects.create(title="Post", user=self._user,
+                                    publish_date=start + timedelta(days=day))
+        keyset = ("-publish_date", "-id")
+        posts = BlogPost.objects.published()
+        expected = list(posts.order_by(*keyset))
+        settings.PAGINATION_KEYSET = True
+        try:
+            pages, cursor = [], None
+            while True:
+                page = paginate(posts, cursor, 3, 10, keyset=keyset)
+                pages.append(list(page))
+                if not page.has_next():
+                    break
+                cursor = page.next_page_number()
+            self.assertEqual(sum(pages, []), expected)
+            self.assertEqual([len(p) for p in pages], [3, 3, 1])
+            self.assertEqual(page.number, 3)
+            self.assertEqual(page.paginator.num_pages, 3)
+            while page.has_previous():
+                cursor = page.previous_page_number()
+                page = paginate(posts, cursor, 3, 10, keyset=keyset)
+                self.assertEqual(list(page), pages[page.number - 1])
+            self.assertEqual(page.number, 1)
+            response = self.client.get(reverse("blog_post_list"),
+                                       {"page": "invalid"})
+            self.assertEqual(list(response.context["blog_posts"]),
+                             expected[:settings.BLOG_POST_PER_PAGE])
+            settings.PAGINATION_COUNT_LIMIT = 5
+            page = paginate(posts, None, 3, 10, keyset=keyset)
+            connection.queries = []
+            self.assertEqual(page.paginator.count, 5)
+            self.assertTrue("LIMIT" in connection.queries[-1]["sql"])
+            self.assertTrue(page.paginator.count_is_approximate)
+            self.assertEqual(page.paginator.num_pages, None)
+            # Positional cursors can't go past the limit.
+            cursor = page.encode_cursor(1000)
+            page = paginate(range(20), cursor, 3, 10)
+            self.assertEqual(list(page), [3, 4, 5])
+            self.assertFalse(page.has_next())
+            self.assertTrue(page.has_previous())
+        finally:
+            settings.PAGINATION_KEYSET = False
+            settings.PAGINATION_COUNT_LIMIT = 1000
+
+    def test_blog_feed(self):
+        """
+        Test that blog feeds are built with the same number of
+        queries however many posts they contain, and that conditional
+        requests for an unchanged feed get a 304 response.
+        """
+        BlogPost.objects.all().delete()
+        # Match the test client's host, so the site is only looked up
+        # once per request.
+        Site.objects.filter(id=settings.SITE_ID).update(domain="testserver")
+        self.addCleanup(Site.objects.clear_cache)
+        category = BlogCategory.objects.create(title="Feed category")
+        url = reverse("blog_post_feed", kwargs={"format": "rss"})
+        # Request the feed once so the site is cached by Django.
+        self.client.get(url)
+        queries = []
+        for i in range(2):
+            for j in range(3):
+                post = BlogPost.objects.create(title="Post", user=self._user)
+                post.categories.add(category)
+            connection.queries = []
+            response = self.client.get(url)
+            queries.append(len(connection.queries))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries[0], queries[1])
+        self.assertContains(response, "Feed category")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_publish_date_set(self):
+        """
+        Test that items loaded from fixtures without a publish date
+        are given one, and that items without one are returned by
+        ``published``.
+        """
+        from django.core import serializers
+        from mezzanine.utils.sites import current_site_id
+        fixture = ('[{"pk": 9999, "model": "pages.page", "fields": {'
+                   '"title": "Fixture", "slug": "fixture", "status": 2, '
+                   '"site": %s}}]' % current_site_id())
+        for obj in serializers.deserialize("json", fixture):
+            obj.save()
+        page = Page.objects.published().get(slug="fixture")
+        self.assertTrue(page.publish_date is not None)
+        # Items saved before publish dates were set are still
+        # published.
+        Page.objects.filter(id=page.id).update(publish_date=None)
+        self.assertTrue(Page.objects.published().filter(id=page.id))
+
     def test_blog_views(self):
         """
         Basic status code test for blog views.
@@ -332,6 +642,16 @@ class Tests(TestCase):
         self.assertEqual(blog_post.rating_sum, _sum)
         self.assertEqual(blog_post.rating_average, average)
 
+    def clear_current_request(self):
+        """
+        Removes any request stored for the current thread, such as one
+        set up by another test, since looking up its site performs a
+        query. It's restored once the test has run.
+        """
+        from mezzanine.core.request import _thread_local
+        self.addCleanup(setattr, _thread_local, "request", current_request())
+        _thread_local.request = None
+
     def queries_used_for_template(self, template, **context):
         """
         Return the number of queries used when rendering a template
@@ -393,6 +713,100 @@ class Tests(TestCase):
         after = self.queries_used_for_template(template)
         self.assertEquals(before, after)
 
+    def test_admin_page_ordering(self):
+        """
+        Test that reordering pages via the admin is reflected in menus
+        rendered from the cached page tree.
+        """
+        RichTextPage.objects.create(title="Ordered first")
+        second = RichTextPage.objects.create(title="Ordered second")
+        template = Template('{% load pages_tags %}'
+                            '{% page_menu "pages/menus/tree.html" %}')
+        siblings = ["ordering_%s" % page_id for page_id in
+                    Page.objects.filter(parent=None).order_by("-_order")
+                    .values_list("id", flat=True)]
+        data = {"id": "ordering_%s" % second.id,
+                "parent_id": "ordering_null", "siblings[]": siblings}
+        self.client.login(username=self._username, password=self._password)
+        # Install the cache, so that the page tree is cached.
+        settings.TESTING = False
+        settings.MIDDLEWARE_CLASSES = settings.MIDDLEWARE_CLASSES + (
+            "mezzanine.core.middleware.UpdateCacheMiddleware",
+            "mezzanine.core.middleware.FetchFromCacheMiddleware")
+        try:
+            self.assertTrue(cache_installed())
+            rendered = template.render(Context({}))
+            self.assertTrue(rendered.index("Ordered first") <
+                            rendered.index("Ordered second"))
+            self.client.post(reverse("admin_page_ordering"), data)
+            rendered = template.render(Context({}))
+            self.assertTrue(rendered.index("Ordered second") <
+                            rendered.index("Ordered first"))
+        finally:
+            del settings.TESTING
+            del settings.MIDDLEWARE_CLASSES
+            self.client.logout()
+
+    def test_as_tag_cache_key(self):
+        """
+        Test that the values of cached ``as_tag`` tags with the same
+        name in different modules are cached separately.
+        """
+        from django.template.base import Token, TOKEN_BLOCK
+        from mezzanine.template import Library
+        token = Token(TOKEN_BLOCK, "recent as value")
+        # Install the cache, so that the values are cached.
+        settings.TESTING = False
+        settings.MIDDLEWARE_CLASSES = settings.MIDDLEWARE_CLASSES + (
+            "mezzanine.core.middleware.UpdateCacheMiddleware",
+            "mezzanine.core.middleware.FetchFromCacheMiddleware")
+        try:
+            for module in ("first.templatetags", "second.templatetags"):
+                register = Library()
+                recent = lambda module=module: module
+                recent.__name__ = "recent"
+                recent.__module__ = module
+                register.as_tag(cache_models=[BlogCategory])(recent)
+                context = Context({})
+                register.tags["recent"](None, token).render(context)
+                self.assertEqual(context["value"], module)
+        finally:
+            del settings.TESTING
+            del settings.MIDDLEWARE_CLASSES
+
+    def test_page_menu_context(self):
+        """
+        Test that the flags for each page's relationship to the current
+        page are resolved against a single menu context per request,
+        without any queries.
+        """
+        from mezzanine.pages.menus import MenuContext
+        primary = RichTextPage.objects.create(title="Primary")
+        secondary = RichTextPage.objects.create(title="Secondary",
+                                                parent=primary)
+        current = RichTextPage.objects.create(title="Current",
+                                              parent=secondary)
+        child = RichTextPage.objects.create(title="Child", parent=current)
+        other = RichTextPage.objects.create(title="Other")
+        request = RequestFactory().get(current.get_absolute_url())
+        context = Context({"request": request, "_current_page": current})
+        connection.queries = []
+        for page in (primary, secondary, current, child, other):
+            page.set_helpers(context)
+        self.assertEqual(len(connection.queries), 0)
+        menu = MenuContext.for_context(context)
+        self.assertTrue(request._menu_context is menu)
+        self.assertEqual(menu.ascendant_ids,
+                         set([primary.id, secondary.id, current.id]))
+        for page in (primary, secondary, current):
+            self.assertTrue(page.is_current_or_ascendant())
+        for page in (child, other):
+            self.assertFalse(page.is_current_or_ascendant())
+        self.assertTrue(current.is_current)
+        self.assertFalse(secondary.is_current)
+        self.assertTrue(child.is_current_child)
+        self.assertTrue(other.is_primary and not child.is_primary)
+
     def test_page_menu_flags(self):
         """
         Test that pages only appear in the menu templates they've been
@@ -411,6 +825,106 @@ class Tests(TestCase):
         for page in pages:
             self.assertEquals(rendered.count(page.title), len(page.in_menus))
 
+    def test_page_tree(self):
+        """
+        Test the page tree holds the pages published for each class
+        of user in order, survives pickling for storage in cache,
+        creates pages without any queries, and that its cache key
+        changes whenever pages change.
+        """
+        from cPickle import dumps, loads
+        from mezzanine.pages.tree import PageTree, page_tree_cache_key
+        self.clear_current_request()
+        parent = RichTextPage.objects.create(title="Tree parent",
+                                             status=CONTENT_STATUS_PUBLISHED)
+        child = RichTextPage.objects.create(title="Tree child", parent=parent,
+                                            status=CONTENT_STATUS_PUBLISHED)
+        draft = RichTextPage.objects.create(title="Tree draft", parent=parent,
+                                            status=CONTENT_STATUS_DRAFT)
+        tree = loads(dumps(PageTree.for_user()))
+        connection.queries = []
+        ids = [page.id for page in tree.pages()]
+        page = tree.get(child.slug)
+        self.assertEqual(len(connection.queries), 0)
+        self.assertTrue(parent.id in ids and child.id in ids)
+        self.assertFalse(draft.id in ids)
+        position = tree.position(child.id)
+        self.assertEqual(tree.ascendants(position),
+                         [tree.position(parent.id)])
+        self.assertEqual([tree.value(p, "id") for p in
+                          tree.children(tree.position(parent.id))],
+                         [child.id])
+        self.assertEqual(tree.position_for_slug(child.slug), position)
+        self.assertEqual(page.get_absolute_url(), child.get_absolute_url())
+        self.assertEqual(page.in_menus, Page.objects.get(id=child.id).in_menus)
+        staff_tree = PageTree.for_user(self._user)
+        self.assertTrue(staff_tree.position(draft.id) is not None)
+        self.assertTrue(tree.position(draft.id) is None)
+        template = ('{% load pages_tags %}'
+                    '{% page_menu "pages/menus/tree.html" %}')
+        rendered = Template(template).render(Context({}))
+        self.assertTrue(child.title in rendered)
+        self.assertFalse(draft.title in rendered)
+        key = page_tree_cache_key()
+        self.assertNotEqual(key, page_tree_cache_key(self._user))
+        child.save()
+        self.assertNotEqual(key, page_tree_cache_key())
+
+    def test_route_table(self):
+        """
+        Test the route table finds the same page for a slug as
+        ``Page.objects.with_ascendants_for_slug``, with its ascendants,
+        without any queries, and that the page is only loaded in full
+        on request.
+        """
+        from mezzanine.pages.tree import PageTree, RouteTable, load_page
+        self.clear_current_request()
+        published = {"status": CONTENT_STATUS_PUBLISHED}
+        primary = RichTextPage.objects.create(title="Routes", **published)
+        secondary = RichTextPage.objects.create(title="Secondary",
+                                                parent=primary, **published)
+        RichTextPage.objects.create(title="Routes other", **published)
+        tree = PageTree.for_user(include_login_required=True)
+        routes = RouteTable(tree)
+        for slug in ("routes", "routes/secondary", "routes/secondary/x/1",
+                     "routes/missing", "routes-other/x", "missing", "/"):
+            pages = Page.objects.with_ascendants_for_slug(slug)
+            page = routes.page_for_slug(slug)
+            self.assertEqual(getattr(page, "id", None),
+                             pages[0].id if pages else None)
+        connection.queries = []
+        page = routes.page_for_slug("routes/secondary/x")
+        self.assertEqual(page.id, secondary.id)
+        self.assertEqual([p.id for p in page.get_ascendants()], [primary.id])
+        self.assertEqual(page.titles, "Routes / Secondary")
+        self.assertEqual(len(connection.queries), 0)
+        with self.assertNumQueries(1):
+            page = load_page(page)
+        self.assertEqual(page.id, secondary.id)
+        self.assertFalse(page._deferred)
+        self.assertNumQueries(0, page.get_ascendants)
+        self.assertNumQueries(0, load_page, page)
+        # Pages that expire after the table is built aren't routed to,
+        # and the table expires when they do.
+        from datetime import timedelta
+        from django.utils.timezone import now
+        from mezzanine.pages.tree import page_tree_timeout
+        secondary.expiry_date = now() + timedelta(seconds=30)
+        secondary.save()
+        self.assertTrue(page_tree_timeout() <= 31)
+        routes = RouteTable(PageTree.for_user(), page_tree_timeout())
+        self.assertTrue(routes.expires <= time() + 31)
+        page = routes.page_for_slug("routes/secondary/x")
+        self.assertEqual(page.id, secondary.id)
+        self.assertEqual(page.expiry_date, secondary.expiry_date)
+        # Expire the page in the table, as 30 seconds passing would.
+        expiry_dates = routes.tree.values["expiry_date"]
+        expiry_dates.timestamps[routes.tree.position(secondary.id)] -= 60
+        page = routes.page_for_slug("routes/secondary/x")
+        self.assertEqual(page.id, primary.id)
+        staff = PageTree.for_user(self._user)
+        self.assertFalse(staff.expired(staff.position(secondary.id)))
+
     def test_page_menu_default(self):
         """
         Test that the default value for the ``in_menus`` field is used
@@ -504,6 +1018,177 @@ class Tests(TestCase):
         if results:
             self.assertEqual(results[0].id, second)
 
+    def test_search_heterogeneous(self):
+        """
+        Test that searching across models returns lazy results,
+        ranked by the database and merged as they're sliced.
+        """
+        from mezzanine.core.search import SearchResults
+        RichTextPage.objects.all().delete()
+        BlogPost.objects.all().delete()
+        page = RichTextPage.objects.create(title="merged merged")
+        post = BlogPost.objects.create(title="merged", user=self._user)
+        # Models defined by other tests are never synced, so the
+        # models are given explicitly rather than searching via
+        # Displayable, which would include them.
+        results = SearchResults([RichTextPage.objects.search("merged"),
+                                 BlogPost.objects.search("merged")])
+        self.assertEqual(len(results), 2)
+        self.assertEqual([r.id for r in results[:2]], [page.id, post.id])
+        self.assertEqual(results[1].id, post.id)
+        self.assertEqual(results[0].result_count, 10)
+        self.assertNumQueries(2, lambda: results[:1])
+
+    def test_search_index(self):
+        """
+        Test searching with ``IndexSearchBackend``, which should
+        match whole words in the index rather than scanning content.
+        """
+        settings.SEARCH_BACKEND = "mezzanine.core.search.IndexSearchBackend"
+        try:
+            RichTextPage.objects.all().delete()
+            first = RichTextPage.objects.create(title="test page",
+                content="<p>index</p>").id
+            second = RichTextPage.objects.create(
+                title="test another test page").id
+            self.assertEqual(len(RichTextPage.objects.search("index")), 1)
+            results = RichTextPage.objects.search("test")
+            self.assertEqual([r.id for r in results], [second, first])
+            results = RichTextPage.objects.search("+another test")
+            self.assertEqual([r.id for r in results], [second])
+            results = RichTextPage.objects.search("-another test")
+            self.assertEqual([r.id for r in results], [first])
+            results = RichTextPage.objects.search('"another test"')
+            self.assertEqual([r.id for r in results], [second])
+            results = RichTextPage.objects.search('"test another"')
+            self.assertEqual([r.id for r in results], [second])
+            results = RichTextPage.objects.search('"page test"')
+            self.assertEqual(len(results), 0)
+            # Whole words only.
+            self.assertEqual(len(RichTextPage.objects.search("tes")), 0)
+            # Searching the base Page model uses the same index.
+            self.assertEqual(len(Page.objects.search("index")), 1)
+            # Saving an indexed page again updates its entry.
+            page = RichTextPage.objects.get(id=second)
+            page.title = "index"
+            page.save()
+            self.assertEqual(len(RichTextPage.objects.search("index")), 2)
+            RichTextPage.objects.get(id=first).delete()
+            self.assertEqual(len(RichTextPage.objects.search("index")), 1)
+            RichTextPage.objects.get(id=second).delete()
+            self.assertEqual(len(RichTextPage.objects.search("index")), 0)
+        finally:
+            del settings.SEARCH_BACKEND
+
+    def test_search_documents(self):
+        """
+        Test searching across models with ``IndexSearchBackend`` via a
+        single query against their search documents, with only the
+        instances in the requested slice retrieved.
+        """
+        from mezzanine.core.search import DocumentSearchBackend
+        from mezzanine.core.search import IndexSearchBackend
+        self.clear_current_request()
+        settings.SEARCH_BACKEND = "mezzanine.core.search.IndexSearchBackend"
+        try:
+            RichTextPage.objects.all().delete()
+            BlogPost.objects.all().delete()
+            page = RichTextPage.objects.create(title="unified unified")
+            post = BlogPost.objects.create(title="unified", user=self._user)
+            BlogPost.objects.create(title="unified", user=self._user,
+                                    status=CONTENT_STATUS_DRAFT)
+            backend = IndexSearchBackend()
+            models = [RichTextPage, BlogPost]
+            results = backend.search_documents(models, "unified")
+            self.assertNumQueries(1, len, results)
+            self.assertEqual(len(results), 2)
+            self.assertNumQueries(3, lambda: results[:2])
+            self.assertEqual([r.id for r in results[:2]], [page.id, post.id])
+            self.assertEqual(results[1].result_count, 5)
+            results = backend.search_documents(models, "unified",
+                                               for_user=self._user)
+            self.assertEqual(len(results), 3)
+            results = backend.search_documents(models, "+unified -unified")
+            self.assertEqual(len(results), 0)
+            # Phrases need to be matched against each model's fields.
+            self.assertEqual(backend.search_documents(models, '"a b"'), None)
+            # Backends without the methods for searching documents
+            # search each model separately.
+            backend = DocumentSearchBackend()
+            self.assertEqual(backend.search_documents(models, "unified"),
+                             None)
+        finally:
+            del settings.SEARCH_BACKEND
+
+    def test_search_cache(self):
+        """
+        Test that cached search results are keyed on the class of
+        user and the version of all content, and that the ranked
+        results stored retrieve the same instances.
+        """
+        from mezzanine.core.search import CachedSearchResults
+        from mezzanine.core.search import ranked_results, search_cache_key
+        RichTextPage.objects.all().delete()
+        first = RichTextPage.objects.create(title="cached cached")
+        second = RichTextPage.objects.create(title="cached")
+        key = search_cache_key(RichTextPage, "cached")
+        self.assertEqual(key, search_cache_key(RichTextPage, "Cached"))
+        self.assertNotEqual(key, search_cache_key(RichTextPage, "cached",
+                                                  for_user=self._user))
+        ranked = ranked_results(RichTextPage.objects.search("cached"))
+        results = CachedSearchResults(ranked)
+        self.assertEqual(len(results), 2)
+        self.assertEqual([r.id for r in results[:2]],
+                         [first.id, second.id])
+        self.assertEqual(results[1].result_count, 5)
+        second.delete()
+        self.assertNotEqual(key, search_cache_key(RichTextPage, "cached"))
+        self.assertEqual([r.id for r in results], [first.id])
+
+    def test_search_cache_key_versions(self):
+        """
+        Test that search cache keys differ for content versions bumped
+        within a fraction of a second of each other.
+        """
+        from django.core.cache import cache
+        from mezzanine.core.models import Displayable
+        from mezzanine.core.search import search_cache_key
+        from mezzanine.utils.cache import _tag_key
+        tag_key = _tag_key(model_cache_tag(Displayable))
+        keys = []
+        for version in (1381990000.123451, 1381990000.123452):
+            cache.set(tag_key, version)
+            keys.append(search_cache_key(RichTextPage, "cached"))
+        cache.delete(tag_key)
+        self.assertNotEqual(keys[0], keys[1])
+
+    def test_search_postgres(self):
+        """
+        Test the translation of search queries into a ``tsquery`` by
+        ``PostgresSearchBackend``, and that it falls back to searching
+        each search field on other databases.
+        """
+        from mezzanine.core.search import PostgresSearchBackend
+        from mezzanine.core.search import parse_query
+        backend = PostgresSearchBackend()
+        terms = parse_query('+"another test" page -draft')[0]
+        sql, params, phrases = backend.tsquery(terms)
+        self.assertEqual(sql, "(plainto_tsquery(%s, %s)) && "
+                              "!!plainto_tsquery(%s, %s)")
+        self.assertEqual(params[1::2], ["another test", "draft"])
+        self.assertEqual(phrases, {"+": ["another test"], "-": []})
+        sql, params, phrases = backend.tsquery(["test", "page"])
+        self.assertEqual(sql.count("||"), 1)
+        if connection.vendor != "postgresql":
+            settings.SEARCH_BACKEND = ("mezzanine.core.search."
+                                       "PostgresSearchBackend")
+            try:
+                RichTextPage.objects.create(title="fallback")
+                results = RichTextPage.objects.search("fall")
+                self.assertEqual(len(results), 1)
+            finally:
+                del settings.SEARCH_BACKEND
+
     def test_forms(self):
         """
         Simple 200 status check against rendering and posting to forms
@@ -553,6 +1238,44 @@ class Tests(TestCase):
         settings.use_editable()
         for (name, value) in values_by_name.items():
             self.assertEqual(getattr(settings, name), value)
+        # With Django's default local memory cache, which isn't
+        # shared between processes, editable settings are reloaded
+        # from the DB each time.
+        self.clear_current_request()
+        name, value = values_by_name.items()[0]
+        settings.use_editable()
+        self.assertNumQueries(1, getattr, settings, name)
+        # With a shared cache, they're only reloaded from the DB once
+        # their version changes.
+        from django.core import cache
+        from tempfile import mkdtemp
+        cache_dir = mkdtemp()
+        self.addCleanup(rmtree, cache_dir)
+        default_cache = cache.cache
+        cache.cache = cache.get_cache(
+            "django.core.cache.backends.filebased.FileBasedCache",
+            LOCATION=cache_dir)
+        self.addCleanup(setattr, cache, "cache", default_cache)
+        settings.use_editable()
+        getattr(settings, name)
+        settings.use_editable()
+        self.assertNumQueries(0, getattr, settings, name)
+        Setting.objects.filter(name=name).delete()
+        settings.use_editable()
+        self.assertEqual(getattr(settings, name),
+                         registry[name]["default"])
+        # Calling use_editable in another thread doesn't affect the
+        # editable settings loaded in this one.
+        settings.use_editable()
+        editable = getattr(settings, name)
+        thread = Thread(target=settings.use_editable)
+        thread.start()
+        thread.join()
+        self.assertNumQueries(0, getattr, settings, name)
+        self.assertEqual(getattr(settings, name), editable)
+        # Remove the remaining settings, which also changes their
+        # version, so that other tests don't use the values loaded.
+        Setting.objects.all().delete()
 
     def test_syntax(self):
         """
@@ -697,3 +1420,214 @@ class Tests(TestCase):
         self.assertFalse(manager._search_fields)
         manager = DisplayableManager(search_fields={'foo': 10})
         self.assertTrue(manager._search_fields)
+
+    def test_cache_lease(self):
+        """
+        Test that only a single caller is given a cache miss when a
+        mint cache entry expires, and that other callers are given
+        the stale entry until a new one is set.
+        """
+        key = "test-cache-lease-%s" % uuid4()
+        before = cache_stats()
+        cache_set(key, "stale", -1)
+        self.assertEqual(cache_get(key), None)
+        self.assertEqual(cache_get(key), "stale")
+        self.assertEqual(cache_get(key), "stale")
+        cache_set(key, "fresh")
+        self.assertEqual(cache_get(key), "fresh")
+        after = cache_stats()
+        self.assertEqual(after["regenerated"] - before.get("regenerated", 0),
+                         1)
+        self.assertEqual(after["coalesced"] - before.get("coalesced", 0), 2)
+        # A missing entry only takes a lease when waiting is asked
+        # for, and then only gives a single miss, without any waiting
+        # when CACHE_LEASE_WAIT_SECONDS is 0.
+        key = "test-cache-lease-%s" % uuid4()
+        start = time()
+        self.assertEqual(cache_get(key), None)
+        self.assertEqual(cache_get(key), None)
+        self.assertTrue(cache_lease(key))
+        cache_release(key)
+        self.assertTrue(time() - start < 1)
+        wait_seconds = settings.CACHE_LEASE_WAIT_SECONDS
+        settings.CACHE_LEASE_WAIT_SECONDS = 0
+        try:
+            self.assertEqual(cache_get(key, wait=True), None)
+            self.assertEqual(cache_get(key, wait=True), None)
+        finally:
+            settings.CACHE_LEASE_WAIT_SECONDS = wait_seconds
+        cache_release(key)
+        self.assertEqual(cache_stats()["wait_expired"],
+                         before.get("wait_expired", 0) + 1)
+
+    def test_nevercache_template(self):
+        """
+        Test that compiled templates for ``nevercache`` content are
+        reused for the same source.
+        """
+        source = "{{ %s|default:'nevercache' }}" % uuid4().hex
+        template = nevercache_template(source)
+        hits = cache_stats().get("nevercache_hits", 0)
+        self.assertTrue(nevercache_template(source) is template)
+        self.assertEqual(cache_stats()["nevercache_hits"], hits + 1)
+        self.assertEqual(template.render(Context({})), "nevercache")
+
+    def test_cache_response_segments(self):
+        """
+        Test that cached responses are stored split into static and
+        ``nevercache`` segments, that the ``nevercache`` segments are
+        rendered when the response is retrieved from cache, and that
+        entries stored in an unknown format are ignored.
+        """
+        from mezzanine.core.middleware import UpdateCacheMiddleware
+        from mezzanine.core.middleware import _pack_response, _unpack_response
+        token = nevercache_token()
+        content = "static%s{{ 1|add:1 }}%sstatic" % (token, token)
+        request = RequestFactory().get("/")
+        request.user = AnonymousUser()
+        request._messages = default_storage(request)
+        packed = _pack_response(HttpResponse(content), request)
+        self.assertEqual(len(packed[3]), 3)
+        response = _unpack_response(packed, request)
+        response = UpdateCacheMiddleware().process_response(request, response)
+        self.assertEqual(response.content, "static2static")
+        packed = _pack_response(HttpResponse("static"), request)
+        self.assertEqual(_unpack_response(packed, request).content, "static")
+        self.assertEqual(_unpack_response(content, request), None)
+
+    def test_cache_response_headers(self):
+        """
+        Test that cached responses retain their headers, and that
+        conditional GETs are answered from cache with a 304.
+        """
+        from mezzanine.core.middleware import _pack_response, _unpack_response
+        from mezzanine.core.middleware import _not_modified
+        response = HttpResponse("{}", content_type="application/json")
+        response["ETag"] = '"etag"'
+        request = RequestFactory().get("/", HTTP_IF_NONE_MATCH='"etag"')
+        packed = _pack_response(response, request)
+        response = _unpack_response(packed, request)
+        self.assertEqual(response["Content-Type"], "application/json")
+        not_modified = _not_modified(request, response)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["ETag"], '"etag"')
+        request = RequestFactory().get("/", HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(_not_modified(request, response), None)
+
+    def test_cache_response_compress(self):
+        """
+        Test that cached responses are stored gzipped with the
+        ``CACHE_COMPRESS`` setting, and sent gzipped only to clients
+        that accept it.
+        """
+        from mezzanine.core.middleware import _pack_response, _unpack_response
+        content = "static " * 100
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip")
+        settings.CACHE_COMPRESS = True
+        try:
+            packed = _pack_response(HttpResponse(content), request)
+        finally:
+            del settings.CACHE_COMPRESS
+        self.assertTrue(len(packed[3][0]) < len(content))
+        response = _unpack_response(packed, request)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response.content, packed[3][0])
+        request = RequestFactory().get("/")
+        response = _unpack_response(packed, request)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, content)
+
+    def test_cache_tags(self):
+        """
+        Test that published items are recorded as cache tags for a
+        cached response, and that the response becomes stale once
+        any of them are saved.
+        """
+        from mezzanine.core.middleware import _pack_response
+        from mezzanine.core.request import _thread_local
+        request = RequestFactory().get("/")
+        request.session = {}
+        request._cache_tags = set()
+        request._cache_started = 0
+        _thread_local.request = request
+        try:
+            list(BlogPost.objects.published())
+        finally:
+            _thread_local.request = None
+        tag = model_cache_tag(BlogPost)
+        packed = _pack_response(HttpResponse("static"), request)
+        self.assertEqual(packed[5], [tag])
+        started = time()
+        self.assertFalse(cache_tags_bumped(packed[5], started))
+        BlogPost.objects.create(title="Tagged", user=self._user)
+        self.assertTrue(cache_tags_bumped(packed[5], started))
+
+    def test_cache_tags_listing_fields(self):
+        """
+        Test that only changes to the ``listing_fields`` of an item
+        bump the cache tag for its model, while any change bumps the
+        tag for the item, and that the handlers bumping them are only
+        connected to ``Displayable`` models.
+        """
+        from django.db.models.signals import post_init
+        self.assertTrue(post_init.has_listeners(BlogPost))
+        self.assertFalse(post_init.has_listeners(Keyword))
+        post = BlogPost.objects.create(title="Listed", user=self._user)
+        post = BlogPost.objects.get(id=post.id)
+        model_tags = [model_cache_tag(BlogPost)]
+        instance_tags = [instance_cache_tag(post)]
+        started = time()
+        post.content = "Edited"
+        post.save()
+        self.assertFalse(cache_tags_bumped(model_tags, started))
+        self.assertTrue(cache_tags_bumped(instance_tags, started))
+        started = time()
+        post.title = "Renamed"
+        post.save()
+        self.assertTrue(cache_tags_bumped(model_tags, started))
+        started = time()
+        post.categories.add(BlogCategory.objects.create(title="Listed"))
+        self.assertTrue(cache_tags_bumped(model_tags, started))
+
+    def test_current_request_cleared(self):
+        """
+        Test that the current request isn't kept once the response
+        has been returned.
+        """
+        self.client.get(reverse("home"))
+        self.assertIsNone(current_request())
+
+    def test_not_found_site(self):
+        """
+        Test that a 404 response on a site other than the default
+        is rendered for that site, and the current request is then
+        cleared.
+        """
+        site = Site.objects.create(domain="other.example.com")
+        setting = Setting.objects.create(name="SITE_TITLE",
+                                         value="Other title")
+        Setting.objects.filter(id=setting.id).update(site=site)
+        response = self.client.get("/missing-page/",
+                                   HTTP_HOST="other.example.com")
+        self.assertContains(response, "Other title", status_code=404)
+        self.assertIsNone(current_request())
+
+    def test_warm_cache_urls(self):
+        """
+        Test that the ``warm_cache`` command orders URLs with the
+        homepage first, followed by each level of the URL hierarchy.
+        """
+        from mezzanine.core.management.commands.warm_cache import Command
+        home = reverse("home")
+        urls = ["/b/c/", "/b/", home, "/a/"]
+        self.assertEqual(Command().sort_urls(urls),
+                         [home, "/a/", "/b/", "/b/c/"])
+        # Without a urlpattern named "home", "/" is the homepage.
+        from django.core.urlresolvers import set_urlconf
+        set_urlconf(type("urls", (object,), {"urlpatterns": []}))
+        try:
+            urls = ["/b/c/", "/b/", "/", "/a/"]
+            self.assertEqual(Command().sort_urls(urls),
+                             ["/", "/a/", "/b/", "/b/c/"])
+        finally:
+            set_urlconf(None)
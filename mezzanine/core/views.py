@@ -19,6 +19,7 @@ from django.views.decorators.csrf import requires_csrf_token
 from mezzanine.conf import settings
 from mezzanine.core.forms import get_edit_form
 from mezzanine.core.models import Displayable, SitePermission
+from mezzanine.core.search import cached_search
 from mezzanine.utils.cache import add_cache_bypass
 from mezzanine.utils.views import is_editable, paginate, render, set_cookie
 from mezzanine.utils.sites import has_site_permission
@@ -114,7 +115,7 @@ def search(request, template="search_results.html"):
         search_type = _("Everything")
     else:
         search_type = search_model._meta.verbose_name_plural.capitalize()
-    results = search_model.objects.search(query, for_user=request.user)
+    results = cached_search(search_model, query, for_user=request.user)
     paginated = paginate(results, page, per_page, max_paging_links)
     context = {"query": query, "results": paginated,
                "search_type": search_type}
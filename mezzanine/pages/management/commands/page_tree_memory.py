@@ -0,0 +1,93 @@
+
+from cPickle import dumps, HIGHEST_PROTOCOL
+from collections import defaultdict
+from optparse import make_option
+import sys
+
+from django.core.management.base import NoArgsCommand
+
+from mezzanine.pages.models import Page
+from mezzanine.pages.tree import PageTree
+
+
+def deep_size(obj):
+    """
+    Returns the size in bytes of the given object and all of the
+    objects it refers to via containers and instance attributes,
+    counting each object once.
+    """
+    seen = set()
+    size = 0
+    objects = [obj]
+    while objects:
+        obj = objects.pop()
+        if id(obj) in seen or isinstance(obj, type):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            objects.extend(obj.keys())
+            objects.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            objects.extend(obj)
+        elif hasattr(obj, "__dict__"):
+            objects.append(obj.__dict__)
+    return size
+
+
+class Command(NoArgsCommand):
+    """
+    Compares the memory used by ``PageTree`` for a generated tree of
+    pages, with the memory used by ``Page`` instances for the same
+    pages, grouped by parent as ``page_menu`` previously held them
+    for each request.
+    """
+
+    help = ("Compares the memory used by the page tree with the memory "
+            "used by page instances, for a generated tree of pages.")
+    option_list = NoArgsCommand.option_list + (
+        make_option("--pages", dest="pages", type="int", default=50000,
+                    help="Number of pages to generate"),
+        make_option("--children", dest="children", type="int", default=10,
+                    help="Number of children for each page"),
+    )
+
+    def handle_noargs(self, **options):
+        rows = self.generate_rows(options["pages"], options["children"])
+        instances = defaultdict(list)
+        for row in rows:
+            page = Page(**dict(zip(PageTree.fields, row)))
+            instances[page.parent_id].append(page)
+        tree = PageTree(rows)
+        for name, obj in (("Page instances", instances), ("PageTree", tree)):
+            self.stdout.write("%s: %.1f MB in memory, %.1f MB pickled" % (
+                name, deep_size(obj) / 1024. ** 2,
+                len(dumps(obj, HIGHEST_PROTOCOL)) / 1024. ** 2))
+
+    def generate_rows(self, num_pages, num_children):
+        """
+        Generates the values for each of ``PageTree.fields`` for the
+        given number of pages, with the given number of children for
+        each page. Fields that aren't generated, such as
+        ``expiry_date``, are ``None``.
+        """
+        pages = []
+        for i in range(num_pages):
+            page_id = i + 1
+            page = {"id": page_id, "title": u"Page %s" % page_id,
+                    "slug": u"page-%s" % page_id, "in_menus": u"1,2,3",
+                    "login_required": False, "content_model": u"richtextpage",
+                    "parent_id": None, "path": u"", "depth": 0}
+            page["titles"] = page["title"]
+            if i >= num_children:
+                parent = pages[(i - num_children) // num_children]
+                page["parent_id"] = parent["id"]
+                page["slug"] = u"%s/%s" % (parent["slug"], page["slug"])
+                page["titles"] = u"%s / %s" % (parent["titles"],
+                                               page["title"])
+                page["path"] = parent["path"]
+                page["depth"] = parent["depth"] + 1
+            page["path"] = u"%s%s/" % (page["path"], page_id)
+            pages.append(page)
+        return [tuple([page.get(name) for name in PageTree.fields])
+                for page in pages]
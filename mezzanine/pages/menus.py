@@ -0,0 +1,65 @@
+
+from mezzanine.utils.urls import path_to_slug
+
+
+class MenuContext(object):
+    """
+    State shared by every page menu rendered for a request, used by
+    ``Page.set_helpers`` to flag each page's relationship to the
+    current page. The IDs of the current page and its ascendants are
+    computed once, from the current page's ``path``, so that whether
+    each page is the current page or one of its ascendants is
+    resolved by set membership.
+    """
+
+    def __init__(self, current_page=None, request=None):
+        self.current_page = current_page
+        self.current_id = getattr(current_page, "id", None)
+        self.current_parent_id = getattr(current_page, "parent_id", None)
+        self.current_slug = None
+        if request is not None:
+            self.current_slug = path_to_slug(request.path_info)
+        self.ascendant_ids = frozenset()
+        if self.current_id is not None:
+            path = getattr(current_page, "path", None)
+            if path:
+                ids = path.split("/")[:-1]
+            else:
+                ids = [page.id for page in current_page.get_ascendants()]
+                ids.append(self.current_id)
+            self.ascendant_ids = frozenset([int(i) for i in ids])
+
+    @classmethod
+    def for_context(cls, context):
+        """
+        Returns the ``MenuContext`` for the current page in the given
+        template context, which is created once and stored on the
+        request, or in the template context if there's no request.
+        """
+        current_page = context.get("_current_page")
+        request = context.get("request")
+        if request is not None:
+            menu = getattr(request, "_menu_context", None)
+        else:
+            menu = context.get("_menu_context")
+        if menu is None or menu.current_id != getattr(current_page, "id",
+                                                      None):
+            menu = cls(current_page, request)
+            if request is not None:
+                request._menu_context = menu
+            else:
+                context["_menu_context"] = menu
+        return menu
+
+    def is_current(self, page):
+        """
+        Returns ``True`` if the page's slug matches the request's URL.
+        """
+        return page.slug == self.current_slug
+
+    def is_current_or_ascendant(self, page):
+        """
+        Returns ``True`` if the page is the current page, or any page
+        up its parent chain.
+        """
+        return page.id in self.ascendant_ids
@@ -6,6 +6,7 @@ from django.utils.http import urlquote
 from mezzanine.conf import settings
 from mezzanine.pages import page_processors
 from mezzanine.pages.models import Page
+from mezzanine.pages.tree import get_route_table, load_page
 from mezzanine.pages.views import page as page_view
 from mezzanine.utils.urls import path_to_slug
 
@@ -29,16 +30,28 @@ class PageMiddleware(object):
 
     In either case, we add the page to the response's template
     context, so that the current page is always available.
+
+    When Mezzanine's cache is installed, the page and its ascendants
+    are found via the ``RouteTable`` of published pages held in
+    memory, rather than querying for them on every request. Only the
+    page view then loads the rest of the page's fields, so other
+    views under a page, such as the blog, don't query for it at all.
     """
 
     def process_view(self, request, view_func, view_args, view_kwargs):
 
         slug = path_to_slug(request.path_info)
-        pages = Page.objects.with_ascendants_for_slug(slug,
-                        for_user=request.user, include_login_required=True)
-        if pages:
-            page = pages[0]
+        # When the cache is installed, the page is found using the
+        # route table held in memory, otherwise by querying for each
+        # of the slugs within this slug.
+        routes = get_route_table(for_user=request.user)
+        if routes is not None:
+            page = routes.page_for_slug(slug)
         else:
+            pages = Page.objects.with_ascendants_for_slug(slug,
+                        for_user=request.user, include_login_required=True)
+            page = pages[0] if pages else None
+        if page is None:
             # If we can't find a page matching this slug or any
             # of its sub-slugs, skip all further processing.
             return None
@@ -53,7 +66,10 @@ class PageMiddleware(object):
             # Add the page to the ``extra_context`` arg for the
             # page view, which is responsible for choosing which
             # template to use, and raising 404 if there's no page
-            # instance loaded.
+            # instance loaded. The page view renders all of the
+            # page's fields, so a page from the route table is loaded
+            # in full.
+            page = load_page(page)
             view_kwargs.setdefault("extra_context", {})
             view_kwargs["extra_context"]["page"] = page
 
@@ -74,6 +90,7 @@ class PageMiddleware(object):
                 # Matched a non-page urlpattern, but got a 404
                 # for a URL that matches a valid page slug, so
                 # use the page view.
+                page = load_page(page)
                 view_kwargs.setdefault("extra_context", {})
                 view_kwargs["extra_context"]["page"] = page
                 view_func = page_view
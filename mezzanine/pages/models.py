@@ -1,12 +1,16 @@
 from django.core.urlresolvers import resolve, reverse
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
 from django.utils.translation import ugettext_lazy as _
 
 from mezzanine.conf import settings
 from mezzanine.core.models import Displayable, Orderable, RichText
 from mezzanine.pages.fields import MenusField
 from mezzanine.pages.managers import PageManager
-from mezzanine.utils.urls import path_to_slug, slugify
+from mezzanine.pages.menus import MenuContext
+from mezzanine.pages.signals import subtree_changed
+from mezzanine.utils.cache import bump_cache_tags, model_cache_tag
+from mezzanine.utils.urls import slugify
 
 
 class BasePage(Orderable, Displayable):
@@ -32,15 +36,27 @@ class Page(BasePage):
         related_name="children")
     in_menus = MenusField(_("Show in menus"), blank=True, null=True)
     titles = models.CharField(editable=False, max_length=1000, null=True)
+    path = models.CharField(editable=False, max_length=255, null=True,
+        db_index=True)
+    depth = models.IntegerField(editable=False, default=0)
     content_model = models.CharField(editable=False, max_length=50, null=True)
     login_required = models.BooleanField(_("Login required"),
         help_text=_("If checked, only logged in users can view this page"))
 
+    # Fields updated for all the pages below a page with one query
+    # each, when the page is moved or its slug or title changes.
+    bulk_update_fields = ("slug", "titles", "path", "depth")
+
+    listing_fields = Displayable.listing_fields + ("parent", "titles",
+        "in_menus", "login_required", "content_model", "path", "depth",
+        "_order")
+
     class Meta:
         verbose_name = _("Page")
         verbose_name_plural = _("Pages")
         ordering = ("titles",)
         order_with_respect_to = "parent"
+        index_together = [("site", "status", "publish_date")]
 
     def __unicode__(self):
         return self.titles
@@ -64,18 +80,54 @@ class Page(BasePage):
 
     def save(self, *args, **kwargs):
         """
-        Create the titles field using the titles up the parent chain
-        and set the initial value for ordering.
+        Create the titles field using the titles of the parent, set
+        the initial value for ordering, and maintain the materialized
+        ``path`` and ``depth`` fields. If the page's titles or position
+        in the tree changed, the titles, path and depth of all its
+        descendants are updated with a single query.
         """
         if self.id is None:
             self.content_model = self._meta.object_name.lower()
-        titles = [self.title]
+        old_path, old_titles, old_depth = self.path, self.titles, self.depth
         parent = self.parent
-        while parent is not None:
-            titles.insert(0, parent.title)
-            parent = parent.parent
-        self.titles = " / ".join(titles)
+        if parent is not None:
+            self.titles = " / ".join((parent.titles or parent.title,
+                                      self.title))
+            self.depth = parent.depth + 1
+        else:
+            self.titles = self.title
+            self.depth = 0
         super(Page, self).save(*args, **kwargs)
+        parent_path = parent.path if parent is not None else ""
+        self.path = "%s%s/" % (parent_path or "", self.id)
+        if self.path != old_path:
+            Page._base_manager.filter(id=self.id).update(path=self.path)
+        if old_path and (self.path != old_path or
+                         self.titles != old_titles):
+            self._update_descendants(old_path, old_titles, old_depth)
+
+    def _update_descendants(self, old_path, old_titles, old_depth):
+        """
+        Replaces the prefixes of the path and titles of all pages
+        below this page, and adjusts their depth, with one ``UPDATE``
+        against the indexed ``path`` column.
+        """
+        descendants = Page._base_manager.filter(path__startswith=old_path)
+        descendants.exclude(id=self.id).update(
+            path=_ReplacePrefix("path", old_path, self.path),
+            titles=_ReplacePrefix("titles", old_titles + " / ",
+                                  self.titles + " / "),
+            depth=F("depth") + (self.depth - old_depth))
+        self._subtree_changed()
+
+    def _subtree_changed(self):
+        """
+        Sends the ``subtree_changed`` signal once the pages below this
+        page have been updated in bulk, unless this happens as part of
+        ``set_parent``, which sends it once when it's done.
+        """
+        if not getattr(self, "_defer_subtree_changed", False):
+            subtree_changed.send(sender=Page, page=self)
 
     def description_from_content(self):
         """
@@ -92,36 +144,42 @@ class Page(BasePage):
 
     def get_ascendants(self, for_user=None):
         """
-        Returns the ascendants for the page. Ascendants are cached in
-        the ``_ascendants`` attribute, which is populated when the page
-        is loaded via ``Page.objects.with_ascendants_for_slug``.
+        Returns the ascendants for the page, from its parent up to
+        the top-level page. Ascendants are cached in the
+        ``_ascendants`` attribute, which is populated when the page is
+        loaded via ``Page.objects.with_ascendants_for_slug``, and
+        are otherwise retrieved in a single query using the IDs in the
+        page's ``path``. The ``for_user`` argument is no longer used,
+        and remains for backward compatibility.
         """
         if not self.parent_id:
             # No parents at all, bail out.
             return []
-        if not hasattr(self, "_ascendants"):
-            # _ascendants has not been either page.get_ascendants or
-            # Page.objects.assigned by with_ascendants_for_slug, so
-            # run it to see if we can retrieve all parents in a single
-            # query, which will occur if the slugs for each of the pages
-            # have not been customised.
-            if self.slug:
-                kwargs = {"for_user": for_user}
-                pages = Page.objects.with_ascendants_for_slug(self.slug,
-                                                              **kwargs)
-                self._ascendants = pages[0]._ascendants
+        if not getattr(self, "_ascendants", None):
+            if self.path:
+                ids = self.path.split("/")[:-2]
+                pages = Page.objects.filter(id__in=ids)
+                self._ascendants = sorted(pages, key=lambda p: -p.depth)
             else:
+                # The page hasn't been saved with its path yet, so
+                # retrieve the parents recursively.
                 self._ascendants = []
-        if not self._ascendants:
-            # Page has a parent but with_ascendants_for_slug failed to
-            # find them due to custom slugs, so retrieve the parents
-            # recursively.
-            child = self
-            while child.parent_id is not None:
-                self._ascendants.append(child.parent)
-                child = child.parent
+                child = self
+                while child.parent_id is not None:
+                    self._ascendants.append(child.parent)
+                    child = child.parent
         return self._ascendants
 
+    def get_descendants(self, include_self=False):
+        """
+        Returns a queryset of all pages below this page in the tree,
+        retrieved using the page's ``path``.
+        """
+        descendants = Page.objects.filter(path__startswith=self.path)
+        if not include_self:
+            descendants = descendants.exclude(id=self.id)
+        return descendants
+
     @classmethod
     def get_content_models(cls):
         """
@@ -149,41 +207,53 @@ class Page(BasePage):
     def set_slug(self, new_slug):
         """
         Changes this page's slug, and all other pages whose slugs
-        start with this page's slug.
+        start with this page's slug. All pages other than those with
+        overridden urlpatterns are updated with a single query.
         """
-        for page in Page.objects.filter(slug__startswith=self.slug):
-            if not page.overridden():
-                page.slug = new_slug + page.slug[len(self.slug):]
-                page.save()
+        old_slug = self.slug
+        if old_slug:
+            pages = Page.objects.filter(Q(slug=old_slug) |
+                                        Q(slug__startswith=old_slug + "/"))
+            overridden = [page_id for page_id, slug
+                          in pages.values_list("id", "slug")
+                          if Page(slug=slug).overridden()]
+            pages.exclude(id__in=overridden).update(
+                slug=_ReplacePrefix("slug", old_slug, new_slug))
+            self._subtree_changed()
         self.slug = new_slug
 
     def set_parent(self, new_parent):
         """
         Change the parent of this page, changing this page's slug to match
-        the new parent if necessary.
+        the new parent if necessary. The page and all of its descendants
+        are updated within a single transaction.
         """
         self_slug = self.slug
         old_parent_slug = self.parent.slug if self.parent else ""
         new_parent_slug = new_parent.slug if new_parent else ""
 
         # Make sure setting the new parent won't cause a cycle.
-        parent = new_parent
-        while parent is not None:
-            if parent.pk == self.pk:
-                raise AttributeError("You can't set a page or its child as"
-                                     " a parent.")
-            parent = parent.parent
-
-        self.parent = new_parent
-        self.save()
-
-        if self_slug:
-            if not old_parent_slug:
-                self.set_slug("/".join((new_parent_slug, self.slug)))
-            elif self.slug.startswith(old_parent_slug):
-                new_slug = self.slug.replace(old_parent_slug,
-                                             new_parent_slug, 1)
-                self.set_slug(new_slug.strip("/"))
+        if new_parent is not None and self.path and (
+                new_parent.path or "").startswith(self.path):
+            raise AttributeError("You can't set a page or its child as"
+                                 " a parent.")
+
+        self._defer_subtree_changed = True
+        try:
+            with transaction.commit_on_success():
+                self.parent = new_parent
+                self.save()
+                if self_slug:
+                    if not old_parent_slug:
+                        self.set_slug("/".join((new_parent_slug,
+                                                self.slug)))
+                    elif self.slug.startswith(old_parent_slug):
+                        new_slug = self.slug.replace(old_parent_slug,
+                                                     new_parent_slug, 1)
+                        self.set_slug(new_slug.strip("/"))
+        finally:
+            del self._defer_subtree_changed
+        self._subtree_changed()
 
     def overridden(self):
         """
@@ -217,30 +287,21 @@ class Page(BasePage):
         """
         Called from the ``page_menu`` template tag and assigns a
         handful of properties based on the current page, that are used
-        within the various types of menus.
+        within the various types of menus. These are resolved against
+        the ``MenuContext`` for the request, which holds the current
+        page and the IDs of its ascendants.
         """
-        current_page = context["_current_page"]
-        current_page_id = getattr(current_page, "id", None)
-        current_parent_id = getattr(current_page, "parent_id", None)
+        menu = MenuContext.for_context(context)
         # Am I a child of the current page?
-        self.is_current_child = self.parent_id == current_page_id
+        self.is_current_child = self.parent_id == menu.current_id
         self.is_child = self.is_current_child  # Backward compatibility
         # Is my parent the same as the current page's?
-        self.is_current_sibling = self.parent_id == current_parent_id
+        self.is_current_sibling = self.parent_id == menu.current_parent_id
         # Am I the current page?
-        try:
-            request = context["request"]
-        except KeyError:
-            # No request context, most likely when tests are run.
-            self.is_current = False
-        else:
-            self.is_current = self.slug == path_to_slug(request.path_info)
-
+        self.is_current = menu.is_current(self)
         # Is the current page me or any page up the parent chain?
-        def is_c_or_a(page_id):
-            parent_id = context["_parent_page_ids"].get(page_id)
-            return self.id == page_id or (parent_id and is_c_or_a(parent_id))
-        self.is_current_or_ascendant = lambda: bool(is_c_or_a(current_page_id))
+        is_current_or_ascendant = menu.is_current_or_ascendant(self)
+        self.is_current_or_ascendant = lambda: is_current_or_ascendant
         # Am I a primary page?
         self.is_primary = self.parent_id is None
         # What's an ID I can use in HTML?
@@ -256,6 +317,30 @@ class Page(BasePage):
         return True
 
 
+class _ReplacePrefix(object):
+    """
+    Expression for ``QuerySet.update`` that replaces the given prefix
+    of a column's value, used for rewriting the paths, titles and
+    slugs of a subtree of pages with a single query.
+    """
+
+    def __init__(self, column, old_prefix, new_prefix):
+        self.column = column
+        self.old_prefix = old_prefix
+        self.new_prefix = new_prefix
+
+    def prepare_database_save(self, field):
+        return self
+
+    def as_sql(self, qn, connection):
+        substr = "SUBSTR(%s, %%s)" % qn(self.column)
+        if connection.vendor == "mysql":
+            sql = "CONCAT(%%s, %s)" % substr
+        else:
+            sql = "(%%s || %s)" % substr
+        return sql, [self.new_prefix, len(self.old_prefix) + 1]
+
+
 class RichTextPage(Page, RichText):
     """
     Implements the default type of page with a single Rich Text
@@ -276,3 +361,47 @@ class Link(Page):
     class Meta:
         verbose_name = _("Link")
         verbose_name_plural = _("Links")
+
+
+def bump_page_cache_tags(sender, page, **kwargs):
+    """
+    Bumps the cache tags for the pages below a page when they're
+    updated in bulk, since ``post_save`` isn't sent for each of them.
+    The IDs and content types of the pages are retrieved with a single
+    query, to bump the tags for each page and each content type
+    affected, along with the tags for ``Page`` and ``Displayable``.
+    """
+    subtree = Page._base_manager.filter(path__startswith=page.path)
+    content_models = dict([(m._meta.object_name.lower(), m)
+                           for m in Page.get_content_models()])
+    tags = set([model_cache_tag(Displayable), model_cache_tag(Page)])
+    for (page_id, content_model) in subtree.values_list("id",
+                                                        "content_model"):
+        tags.add("%s.%s" % (model_cache_tag(Page), page_id))
+        model = content_models.get(content_model)
+        if model is not None:
+            tags.add(model_cache_tag(model))
+            tags.add("%s.%s" % (model_cache_tag(model), page_id))
+    bump_cache_tags(*tags)
+
+
+def reindex_pages(sender, page, **kwargs):
+    """
+    Updates the search index for the pages below a page when they're
+    updated in bulk, for each content type that's searched by any of
+    the fields that are updated this way. No other content types are
+    affected, so by default the pages aren't loaded at all.
+    """
+    from mezzanine.core.search import get_search_backend
+    backend = get_search_backend()
+    for model in [Page] + Page.get_content_models():
+        search_fields = model.objects.get_search_fields()
+        if set(search_fields) & set(Page.bulk_update_fields):
+            subtree = model.objects.filter(path__startswith=page.path,
+                content_model=model._meta.object_name.lower())
+            for instance in subtree:
+                backend.index(instance)
+
+
+subtree_changed.connect(bump_page_cache_tags, sender=Page)
+subtree_changed.connect(reindex_pages, sender=Page)
@@ -0,0 +1,4 @@
+
+from django.dispatch import Signal
+
+subtree_changed = Signal(providing_args=["page"])
@@ -7,6 +7,7 @@ from django.template.loader import get_template
 from django.utils.translation import ugettext_lazy as _
 
 from mezzanine.pages.models import Page
+from mezzanine.pages.tree import get_page_tree
 from mezzanine.utils.urls import admin_url, home_slug
 from mezzanine import template
 
@@ -14,6 +15,36 @@ from mezzanine import template
 register = template.Library()
 
 
+class TreeMenuPages(dict):
+    """
+    Maps page IDs to lists of their child pages for ``page_menu``,
+    or ``None`` to the list of top-level pages, creating the pages
+    from the page tree only for the branches that are rendered.
+    """
+
+    def __init__(self, tree, context):
+        super(TreeMenuPages, self).__init__()
+        self.tree = tree
+        self.context = context
+
+    def __missing__(self, parent_id):
+        if parent_id is None:
+            positions = self.tree.children()
+        else:
+            position = self.tree.position(parent_id)
+            if position is None:
+                return []
+            positions = self.tree.children(position)
+        pages = self.tree.pages(positions)
+        for page, position in zip(pages, positions):
+            page.set_helpers(self.context)
+            num_children = len(self.tree.children(position))
+            page.num_children = lambda n=num_children: n
+            page.has_children = lambda n=num_children: n > 0
+        self[parent_id] = pages
+        return pages
+
+
 @register.render_tag
 def page_menu(context, token):
     """
@@ -46,21 +77,27 @@ def page_menu(context, token):
         except KeyError:
             user = None
             slug = ""
-        num_children = lambda id: lambda: len(context["menu_pages"][id])
-        has_children = lambda id: lambda: num_children(id)() > 0
-        published = Page.objects.published(for_user=user)
         if slug == admin_url(Page, "changelist"):
+            # The admin's page tree needs the content type of each
+            # page for checking permissions.
             related = [m.__name__.lower() for m in Page.get_content_models()]
-            published = published.select_related(*related)
+            published = Page.objects.published(for_user=user)
+            published = published.select_related(*related).order_by("_order")
+            tree = None
         else:
-            published = published.select_related(depth=2)
+            # Otherwise pages are created from the page tree, which is
+            # cached for each site and class of user.
+            tree = get_page_tree(for_user=user)
         # Store the current page being viewed in the context. Used
         # for comparisons in page.set_menu_helpers.
         if "page" not in context:
-            try:
-                context["_current_page"] = published.get(slug=slug)
-            except Page.DoesNotExist:
-                context["_current_page"] = None
+            if tree is not None:
+                context["_current_page"] = tree.get(slug)
+            else:
+                try:
+                    context["_current_page"] = published.get(slug=slug)
+                except Page.DoesNotExist:
+                    context["_current_page"] = None
         elif slug:
             context["_current_page"] = context["page"]
         # Some homepage related context flags. on_home is just a helper
@@ -70,21 +107,22 @@ def page_menu(context, token):
         # in the page menu.
         home = home_slug()
         context["on_home"] = slug == home
-        context["has_home"] = False
-        # Maintain a dict of page IDs -> parent IDs for fast
-        # lookup in setting page.is_current_or_ascendant in
-        # page.set_menu_helpers.
-        context["_parent_page_ids"] = {}
-        pages = defaultdict(list)
-        for page in published.order_by("_order"):
-            page.set_helpers(context)
-            context["_parent_page_ids"][page.id] = page.parent_id
-            setattr(page, "num_children", num_children(page.id))
-            setattr(page, "has_children", has_children(page.id))
-            pages[page.parent_id].append(page)
-            if page.slug == home:
-                context["has_home"] = True
-        context["menu_pages"] = pages
+        if tree is not None:
+            context["has_home"] = tree.position_for_slug(home) is not None
+            context["menu_pages"] = TreeMenuPages(tree, context)
+        else:
+            context["has_home"] = False
+            pages = defaultdict(list)
+            num_children = lambda id: lambda: len(pages[id])
+            has_children = lambda id: lambda: num_children(id)() > 0
+            for page in published:
+                page.set_helpers(context)
+                setattr(page, "num_children", num_children(page.id))
+                setattr(page, "has_children", has_children(page.id))
+                pages[page.parent_id].append(page)
+                if page.slug == home:
+                    context["has_home"] = True
+            context["menu_pages"] = pages
     # ``branch_level`` must be stored against each page so that the
     # calculation of it is correctly applied. This looks weird but if we do
     # the ``branch_level`` as a separate arg to the template tag with the
@@ -100,14 +138,14 @@ def page_menu(context, token):
     # pages for the current parent. Here we also assign the attributes
     # to the page object that determines whether it belongs in the
     # current menu template being rendered.
-    context["page_branch"] = context["menu_pages"].get(parent_page_id, [])
+    context["page_branch"] = context["menu_pages"][parent_page_id]
     context["page_branch_in_menu"] = False
     for page in context["page_branch"]:
         page.in_menu = page.in_menu_template(template_name)
         page.num_children_in_menu = 0
         if page.in_menu:
             context["page_branch_in_menu"] = True
-        for child in context["menu_pages"].get(page.id, []):
+        for child in context["menu_pages"][page.id]:
             if child.in_menu_template(template_name):
                 page.num_children_in_menu += 1
         page.has_children_in_menu = page.num_children_in_menu > 0
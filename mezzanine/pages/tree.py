@@ -0,0 +1,482 @@
+
+from array import array
+from calendar import timegm
+from datetime import datetime
+from threading import Lock
+from time import time
+
+from django.db.models.query_utils import deferred_class_factory
+from django.utils.timezone import is_aware, now, utc
+
+from mezzanine.conf import settings
+from mezzanine.pages.models import Page
+from mezzanine.utils.cache import add_cache_tags, cache_get, cache_installed
+from mezzanine.utils.cache import cache_set, cache_tag_versions
+from mezzanine.utils.cache import cache_user_class, model_cache_tag
+from mezzanine.utils.cache import next_visibility_change
+from mezzanine.utils.sites import current_site_id
+from mezzanine.utils.urls import home_slug
+
+
+class IDColumn(object):
+    """
+    Column of IDs stored in an array, with ``None`` stored as zero,
+    which isn't a valid primary key.
+    """
+
+    def __init__(self, values):
+        self.ids = array("l", [value or 0 for value in values])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        return self.ids[i] or None
+
+
+class TextColumn(object):
+    """
+    Column of strings stored as a single UTF-8 encoded string, with
+    the offset of each value held in an array, which avoids the
+    overhead of a string object per value.
+    """
+
+    def __init__(self, values):
+        self.offsets = array("l", [0])
+        self.nulls = set()
+        parts = []
+        for i, value in enumerate(values):
+            if value is None:
+                self.nulls.add(i)
+                value = u""
+            value = value.encode("utf-8")
+            parts.append(value)
+            self.offsets.append(self.offsets[-1] + len(value))
+        self.text = "".join(parts)
+
+    def __getitem__(self, i):
+        if i in self.nulls:
+            return None
+        value = self.text[self.offsets[i]:self.offsets[i + 1]]
+        return value.decode("utf-8")
+
+
+class DateColumn(object):
+    """
+    Column of dates stored as an array of timestamps, with ``None``
+    stored as zero. Aware dates are stored in UTC, and returned as
+    aware dates in UTC when ``USE_TZ`` is ``True``.
+    """
+
+    def __init__(self, values):
+        self.timestamps = array("d")
+        for value in values:
+            timestamp = 0
+            if value is not None:
+                if is_aware(value):
+                    value = value.astimezone(utc)
+                timestamp = (timegm(value.utctimetuple()) +
+                             value.microsecond / 1000000.)
+            self.timestamps.append(timestamp)
+
+    def __getitem__(self, i):
+        if not self.timestamps[i]:
+            return None
+        value = datetime.utcfromtimestamp(self.timestamps[i])
+        if settings.USE_TZ:
+            value = value.replace(tzinfo=utc)
+        return value
+
+
+class ChoiceColumn(object):
+    """
+    Column of values with few distinct choices, stored as an array of
+    indexes into the choices.
+    """
+
+    def __init__(self, values):
+        self.choices = []
+        self.indexes = array("i")
+        indexes = {}
+        for value in values:
+            if value not in indexes:
+                indexes[value] = len(self.choices)
+                self.choices.append(value)
+            self.indexes.append(indexes[value])
+
+    def __getitem__(self, i):
+        return self.choices[self.indexes[i]]
+
+
+class PageTree(object):
+    """
+    Immutable snapshot of the pages published for a class of user on
+    a site, holding only the fields required to render page menus,
+    and the expiry date of each page, so pages that expire while the
+    tree is held aren't routed to.
+    Each field's values are stored in a compact column, so the tree
+    stays small in memory and in cache, even for very large sites.
+
+    Pages are identified by their position in the tree. They're
+    positioned so that the children of each page are consecutive and
+    in order, and the positions of each page's parent and first child
+    are stored, so the children of a page are found in constant time,
+    and its ascendants in time proportional to its depth, without
+    creating any ``Page`` instances. Instances with the remaining
+    fields deferred are created only for the positions needed, such
+    as the branches of a menu that are rendered.
+    """
+
+    fields = ("id", "parent_id", "slug", "title", "titles", "in_menus",
+              "login_required", "content_model", "path", "depth",
+              "expiry_date")
+    columns = {
+        "id": IDColumn,
+        "parent_id": IDColumn,
+        "slug": TextColumn,
+        "title": TextColumn,
+        "titles": TextColumn,
+        "in_menus": ChoiceColumn,
+        "login_required": lambda values: array("b", values),
+        "content_model": ChoiceColumn,
+        "path": TextColumn,
+        "depth": lambda values: array("h", values),
+        "expiry_date": DateColumn,
+    }
+
+    def __init__(self, rows, unpublished=False):
+        # Whether the tree includes unpublished pages, as it does for
+        # staff, in which case expired pages are still included.
+        self.unpublished = unpublished
+        # Sort by parent, keeping each page's siblings in order.
+        rows = sorted(rows, key=lambda row: row[1] or 0)
+        values = zip(*rows) or [()] * len(self.fields)
+        self.values = {}
+        for name, column in zip(self.fields, values):
+            self.values[name] = self.columns[name](column)
+        ids, parent_ids = self.values["id"], self.values["parent_id"]
+        positions = dict([(ids[i], i) for i in range(len(ids))])
+        self.parents = array("l", [-1]) * len(ids)
+        self.first_child = array("l", [0]) * len(ids)
+        self.num_children = array("l", [0]) * len(ids)
+        self.num_roots = 0
+        for i in range(len(ids)):
+            parent = positions.get(parent_ids[i])
+            if parent is not None:
+                self.parents[i] = parent
+                if not self.num_children[parent]:
+                    self.first_child[parent] = i
+                self.num_children[parent] += 1
+            elif parent_ids[i] is None:
+                self.num_roots += 1
+        self.by_id = self._sorted_positions(ids)
+        self.by_slug = self._sorted_positions(self.values["slug"])
+
+    def __len__(self):
+        return len(self.values["id"])
+
+    def _sorted_positions(self, column):
+        """
+        Returns an array of positions sorted by the values in the
+        given column, for looking up positions by value.
+        """
+        return array("l", sorted(range(len(self)), key=column.__getitem__))
+
+    def _find(self, positions, column, value):
+        """
+        Binary search for the position with the given value, using
+        the positions sorted by the column's values.
+        """
+        low, high = 0, len(positions)
+        while low < high:
+            middle = (low + high) // 2
+            if column[positions[middle]] < value:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(positions) and column[positions[low]] == value:
+            return positions[low]
+        return None
+
+    @classmethod
+    def for_user(cls, for_user=None, include_login_required=False):
+        """
+        Builds the tree of pages published for the given user on the
+        current site, with a single query.
+        """
+        published = Page.objects.published(for_user=for_user,
+            include_login_required=include_login_required)
+        rows = published.order_by("_order").values_list(*cls.fields)
+        return cls(rows, for_user is not None and for_user.is_staff)
+
+    def position(self, page_id):
+        """
+        Returns the position of the page with the given ID, or
+        ``None``.
+        """
+        return self._find(self.by_id, self.values["id"], page_id)
+
+    def position_for_slug(self, slug):
+        """
+        Returns the position of the page with the given slug, or
+        ``None``.
+        """
+        return self._find(self.by_slug, self.values["slug"], slug)
+
+    def value(self, position, field):
+        """
+        Returns the value of the given field for the page at the
+        given position.
+        """
+        return self.values[field][position]
+
+    def children(self, position=None):
+        """
+        Returns the positions of the children of the page at the given
+        position, or of the top-level pages if no position is given.
+        """
+        if position is None:
+            return xrange(self.num_roots)
+        first = self.first_child[position]
+        return xrange(first, first + self.num_children[position])
+
+    def ascendants(self, position):
+        """
+        Returns the positions of the ascendants of the page at the
+        given position, from its parent up to the top-level page.
+        """
+        ascendants = []
+        position = self.parents[position]
+        while position != -1:
+            ascendants.append(position)
+            position = self.parents[position]
+        return ascendants
+
+    def expired(self, position):
+        """
+        Returns whether the page at the given position has expired
+        since the tree was built, for trees of published pages.
+        """
+        if self.unpublished:
+            return False
+        expiry_date = self.value(position, "expiry_date")
+        return expiry_date is not None and expiry_date < now()
+
+    def page_class(self):
+        """
+        Returns the ``Page`` class with the fields that aren't stored
+        in the tree deferred.
+        """
+        skip = set([f.attname for f in Page._meta.fields])
+        return deferred_class_factory(Page, skip - set(self.fields))
+
+    def page(self, position, page_class=None):
+        """
+        Creates a ``Page`` instance for the page at the given position.
+        """
+        page_class = page_class or self.page_class()
+        return page_class(**dict([(name, self.values[name][position])
+                                  for name in self.fields]))
+
+    def pages(self, positions=None):
+        """
+        Returns a ``Page`` instance for each of the given positions,
+        or for every page in the tree.
+        """
+        if positions is None:
+            positions = range(len(self))
+        page_class = self.page_class()
+        return [self.page(position, page_class) for position in positions]
+
+    def get(self, slug):
+        """
+        Returns a ``Page`` instance for the page in the tree with the
+        given slug, or ``None``.
+        """
+        position = self.position_for_slug(slug)
+        return self.page(position) if position is not None else None
+
+
+class RouteTable(object):
+    """
+    Trie of the slugs of the pages in a ``PageTree``, keyed on the
+    segments of each slug, used by ``PageMiddleware`` to find the
+    page for a URL, and its ascendants, without querying for them.
+    Each entry holds the position of the page with the slug ending
+    at that segment, if any, and the entries for the next segments.
+    The table expires after the given timeout in seconds, which
+    defaults to ``CACHE_MIDDLEWARE_SECONDS``.
+    """
+
+    def __init__(self, tree, timeout=None):
+        self.tree = tree
+        self.root = {}
+        if timeout is None:
+            timeout = settings.CACHE_MIDDLEWARE_SECONDS
+        self.expires = time() + timeout
+        for position in range(len(tree)):
+            entries, entry = self.root, None
+            for segment in tree.value(position, "slug").split("/"):
+                if entries is None:
+                    entries = entry[1] = {}
+                entry = entries.get(segment)
+                if entry is None:
+                    entry = entries[segment] = [None, None]
+                entries = entry[1]
+            entry[0] = position
+
+    def lookup(self, slug):
+        """
+        Returns the position of the page with the deepest slug that
+        matches the given slug or its start, or ``None``, matching
+        the page that ``Page.objects.with_ascendants_for_slug``
+        returns first. Pages that have expired since the table was
+        built are skipped, as they are by ``published``.
+        """
+        if slug == "/":
+            position = self.tree.position_for_slug(home_slug())
+            if position is not None and self.tree.expired(position):
+                return None
+            return position
+        position = None
+        entries = self.root
+        for segment in slug.split("/"):
+            entry = entries.get(segment)
+            if entry is None:
+                break
+            if entry[0] is not None and not self.tree.expired(entry[0]):
+                position = entry[0]
+            entries = entry[1] or {}
+        return position
+
+    def page_for_slug(self, slug):
+        """
+        Returns the page found via ``lookup`` for the given slug, and
+        its ascendants, created from the page tree without querying
+        for them, or ``None``. As with ``PageTree.page``, the fields
+        not stored in the tree are deferred, and ``load_page`` can be
+        used to load the page with all of them.
+        """
+        position = self.lookup(slug)
+        if position is None:
+            return None
+        page = self.tree.page(position)
+        ascendants = self.tree.ascendants(position)
+        # Unpublished ascendants aren't in the tree, in which case
+        # they're left for ``page.get_ascendants`` to query, as are
+        # those that have expired since the tree was built.
+        if (len(ascendants) == page.depth and
+                not any(map(self.tree.expired, ascendants))):
+            page._ascendants = self.tree.pages(ascendants)
+        return page
+
+
+def load_page(page):
+    """
+    Returns the given page with all of its fields loaded, for a page
+    created from the page tree with the remaining fields deferred,
+    keeping the ascendants created with it. Loading the fields one at
+    a time as they're accessed would otherwise take a query for each.
+    """
+    if not page._deferred:
+        return page
+    loaded = Page.objects.get(id=page.id)
+    ascendants = getattr(page, "_ascendants", None)
+    if ascendants is not None:
+        loaded._ascendants = ascendants
+    return loaded
+
+
+_route_tables = {}
+_route_tables_lock = Lock()
+
+
+def page_tree_timeout():
+    """
+    Returns the number of seconds a ``PageTree`` and the ``RouteTable``
+    built from it are held for, which is ``CACHE_MIDDLEWARE_SECONDS``,
+    or less if a page is published or expires before then.
+    """
+    timeout = settings.CACHE_MIDDLEWARE_SECONDS
+    change = next_visibility_change([Page])
+    if change is not None:
+        timeout = min(timeout, change)
+    return timeout
+
+
+def _current_route_table(key, version):
+    """
+    Returns the ``RouteTable`` built for the given key if it was built
+    for the given version of the ``Page`` cache tag, and hasn't
+    expired, otherwise ``None``.
+    """
+    try:
+        table_version, table = _route_tables[key]
+    except KeyError:
+        return None
+    if table_version == version and time() < table.expires:
+        return table
+    return None
+
+
+def get_route_table(for_user=None):
+    """
+    Returns the ``RouteTable`` for the given user on the current site,
+    which is held in memory by each process, and built again when the
+    version of the ``Page`` cache tag changes, or after the timeout
+    given by ``page_tree_timeout``, since pages may become published
+    or expire over time. The table includes pages that require
+    login, which ``PageMiddleware`` handles itself. Returns ``None``
+    when the cache isn't installed, since cache tag versions are only
+    shared between processes via the cache.
+    """
+    if not cache_installed():
+        return None
+    tag = model_cache_tag(Page)
+    add_cache_tags(tag)
+    version = cache_tag_versions([tag]).get(tag, 0)
+    key = (current_site_id(), cache_user_class(for_user))
+    table = _current_route_table(key, version)
+    if table is None:
+        # Only one thread builds the table, while the others wait
+        # for it rather than each querying for the same pages.
+        with _route_tables_lock:
+            table = _current_route_table(key, version)
+            if table is None:
+                tree = PageTree.for_user(for_user,
+                                         include_login_required=True)
+                table = RouteTable(tree, page_tree_timeout())
+                _route_tables[key] = (version, table)
+    return table
+
+
+def page_tree_cache_key(for_user=None):
+    """
+    Returns the cache key for the ``PageTree`` of the given user,
+    which depends on the current site, the class of user, and the
+    version of the ``Page`` cache tag, which is bumped whenever a
+    page is saved or deleted.
+    """
+    tag = model_cache_tag(Page)
+    version = cache_tag_versions([tag]).get(tag, 0)
+    return "%s.page_tree.%s.%s.%r" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX,
+        current_site_id(), cache_user_class(for_user), version)
+
+
+def get_page_tree(for_user=None):
+    """
+    Returns the ``PageTree`` for the given user, stored in cache when
+    the cache is installed, until a page is published or expires, or
+    for ``CACHE_MIDDLEWARE_SECONDS``. The ``Page`` cache tag is
+    recorded against the current request, as it is when querying for
+    published pages.
+    """
+    if not cache_installed():
+        return PageTree.for_user(for_user)
+    add_cache_tags(model_cache_tag(Page))
+    cache_key = page_tree_cache_key(for_user)
+    tree = cache_get(cache_key)
+    if tree is None:
+        tree = PageTree.for_user(for_user)
+        cache_set(cache_key, tree, page_tree_timeout())
+    return tree
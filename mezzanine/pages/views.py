@@ -6,6 +6,7 @@ from django.shortcuts import get_object_or_404
 
 from mezzanine.conf import settings
 from mezzanine.pages.models import Page
+from mezzanine.utils.cache import bump_cache_tags, model_cache_tag
 from mezzanine.utils.urls import home_slug
 from mezzanine.utils.views import render
 
@@ -36,6 +37,10 @@ def admin_page_ordering(request):
     # Set the new order for the moved page and its current siblings.
     for i, page_id in enumerate(request.POST.getlist('siblings[]')):
         Page.objects.filter(id=get_id(page_id)).update(_order=i)
+    # The order is updated in bulk without sending ``post_save``, so
+    # the cached page tree and responses containing menus need to be
+    # expired explicitly.
+    bump_cache_tags(model_cache_tag(Page))
     return HttpResponse("ok")
 
 
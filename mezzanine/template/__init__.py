@@ -15,13 +15,29 @@ class Library(template.Library):
     of template tags.
     """
 
-    def as_tag(self, tag_func):
+    def as_tag(self, tag_func=None, cache_models=None):
         """
         Creates a tag expecting the format:
         ``{% tag_name as var_name %}``
         The decorated func returns the value that is given to
         ``var_name`` in the template.
+
+        The value can be stored in cache by giving a sequence of the
+        models it's built from, eg:
+        ``@register.as_tag(cache_models=[BlogPost])``, in which case
+        it's cached per tag function, site and args, until an
+        instance of any of the models is saved or deleted. See
+        ``mezzanine.utils.cache.cached_value``. Only values that
+        don't vary by user or request should be cached.
         """
+        if tag_func is None:
+            return lambda tag_func: self.as_tag(tag_func, cache_models)
+        if cache_models:
+            # Imported here, since this module is loaded by settings.
+            from mezzanine.utils.cache import cached_value
+            from mezzanine.utils.cache import bump_model_cache_tags_on_change
+            bump_model_cache_tags_on_change(cache_models)
+
         @wraps(tag_func)
         def tag_wrapper(parser, token):
             class AsTagNode(template.Node):
@@ -42,7 +58,14 @@ class Library(template.Library):
                                 kwargs[name] = resolve(val)
                                 continue
                         args.append(resolve(arg))
-                    context[parts[-1]] = tag_func(*args, **kwargs)
+                    if cache_models:
+                        name = "%s.%s" % (tag_func.__module__,
+                                          tag_func.__name__)
+                        value = cached_value(name, cache_models, tag_func,
+                                             *args, **kwargs)
+                    else:
+                        value = tag_func(*args, **kwargs)
+                    context[parts[-1]] = value
                     return ""
             return AsTagNode()
         return self.tag(tag_wrapper)
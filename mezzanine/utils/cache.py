@@ -1,11 +1,16 @@
 
+from collections import defaultdict, OrderedDict
 from hashlib import md5
-from time import time
+from threading import Lock
+from time import sleep, time
 
 from django.core.cache import cache
+from django.template import Template
 from django.utils.cache import _i18n_cache_key_suffix
+from django.utils.timezone import now
 
 from mezzanine.conf import settings
+from mezzanine.core.request import current_request
 from mezzanine.utils.device import device_from_request
 from mezzanine.utils.sites import current_site_id
 
@@ -18,6 +23,57 @@ def _hashed_key(key):
     return md5(key.encode("utf-8")).hexdigest()
 
 
+# Counters for the mint cache's regeneration leases, per process.
+# See ``cache_stats`` below.
+_stats = defaultdict(int)
+
+
+def cache_stats():
+    """
+    Returns a dict of counters recorded by ``cache_get`` for the
+    current process. ``regenerated`` is the number of times a caller
+    was given the lease to regenerate an expired or missing entry,
+    ``coalesced`` is the number of times a caller was given an
+    existing entry instead, because another caller held the lease,
+    and ``wait_expired`` is the number of times a caller gave up
+    waiting on a missing entry and regenerated it anyway. Lookups of
+    compiled ``nevercache`` templates via ``nevercache_template`` are
+    also counted, along with their hit ratio.
+    """
+    stats = dict(_stats)
+    hits = stats.get("nevercache_hits", 0)
+    lookups = hits + stats.get("nevercache_misses", 0)
+    if lookups:
+        stats["nevercache_hit_ratio"] = hits / float(lookups)
+    return stats
+
+
+def _lease_key(key):
+    """
+    Key for the regeneration lease of the given cache key.
+    """
+    return _hashed_key(key) + ".lease"
+
+
+def cache_lease(key):
+    """
+    Attempts to acquire the lease for regenerating the given cache
+    key. Uses ``cache.add`` which is atomic with most backends, so
+    only a single caller across all processes sharing the cache will
+    acquire the lease, until it expires after ``CACHE_LEASE_SECONDS``
+    or is released by ``cache_set``.
+    """
+    return cache.add(_lease_key(key), True, settings.CACHE_LEASE_SECONDS)
+
+
+def cache_release(key):
+    """
+    Releases the lease for regenerating the given cache key, for
+    when the caller holding it won't be setting a new entry.
+    """
+    cache.delete(_lease_key(key))
+
+
 def cache_set(key, value, timeout=None, refreshed=False):
     """
     Wrapper for ``cache.set``. Stores the cache entry packed with
@@ -28,32 +84,86 @@ def cache_set(key, value, timeout=None, refreshed=False):
     is not returned, so that a cache miss occurs and the entry
     should be set by the caller, but all other callers will still get
     the stale entry, so no real cache misses ever occur.
+
+    Unless we're storing a stale entry again, any lease held for
+    regenerating the entry is released.
     """
     if timeout is None:
         timeout = settings.CACHE_MIDDLEWARE_SECONDS
     refresh_time = timeout + time()
     real_timeout = timeout + settings.CACHE_SET_DELAY_SECONDS
     packed = (value, refresh_time, refreshed)
-    return cache.set(_hashed_key(key), packed, real_timeout)
+    result = cache.set(_hashed_key(key), packed, real_timeout)
+    if not refreshed:
+        cache_release(key)
+    return result
 
 
-def cache_get(key):
+def cache_get(key, wait=False):
     """
     Wrapper for ``cache.get``. The expiry time for the cache entry
     is stored with the entry. If the expiry time has past, put the
     stale entry back into cache, and don't return it to trigger a
     fake cache miss.
+
+    Only the caller that acquires the lease for the key via
+    ``cache_lease`` gets the fake cache miss - all other callers
+    get the stale entry until the lease holder sets a new one.
+
+    When the entry is missing entirely, no lease is taken unless
+    ``wait`` is ``True``, in which case only the caller acquiring the
+    lease gets the miss, and other callers wait up to
+    ``CACHE_LEASE_WAIT_SECONDS`` for it to set the entry, before
+    giving up and regenerating it themselves. Callers passing
+    ``wait`` must either set the entry or call ``cache_release`` on
+    a miss, otherwise other callers wait for nothing until the lease
+    expires. Only the cache middleware does so.
     """
     packed = cache.get(_hashed_key(key))
     if packed is None:
-        return None
+        if not wait:
+            return None
+        if cache_lease(key):
+            _stats["regenerated"] += 1
+            return None
+        packed = _wait_for_entry(key)
+        if packed is None:
+            _stats["wait_expired"] += 1
+            return None
+        _stats["coalesced"] += 1
+        return packed[0]
     value, refresh_time, refreshed = packed
-    if (time() > refresh_time) and not refreshed:
-        cache_set(key, value, settings.CACHE_SET_DELAY_SECONDS, True)
-        return None
+    if refreshed:
+        # Stale entry stored again by the lease holder.
+        _stats["coalesced"] += 1
+    elif time() > refresh_time:
+        if cache_lease(key):
+            cache_set(key, value, settings.CACHE_SET_DELAY_SECONDS, True)
+            _stats["regenerated"] += 1
+            return None
+        _stats["coalesced"] += 1
     return value
 
 
+def _wait_for_entry(key):
+    """
+    Polls the cache for a missing entry while another caller holds
+    the lease for regenerating it. Stops waiting as soon as the entry
+    is set or the lease is released without it being set, or once
+    ``CACHE_LEASE_WAIT_SECONDS`` have passed.
+    """
+    hashed_key, lease_key = _hashed_key(key), _lease_key(key)
+    give_up = time() + settings.CACHE_LEASE_WAIT_SECONDS
+    while time() < give_up:
+        sleep(.05)
+        found = cache.get_many([hashed_key, lease_key])
+        if hashed_key in found:
+            return found[hashed_key]
+        if lease_key not in found:
+            break
+    return None
+
+
 def cache_installed():
     """
     Returns ``True`` if a cache backend is configured, and the
@@ -86,6 +196,151 @@ def nevercache_token():
     return "nevercache." + settings.SECRET_KEY
 
 
+def split_nevercache(content):
+    """
+    Splits response content on the ``nevercache`` token. Returns a
+    list of alternating segments, where segments at even indexes are
+    static content, and segments at odd indexes are the template code
+    that was wrapped in the ``nevercache`` tag, given as a tuple
+    containing a hash of the template code and the code itself, for
+    use with ``nevercache_template``. Content without any
+    ``nevercache`` tags results in a single static segment.
+    """
+    segments = content.split(nevercache_token())
+    for i in range(1, len(segments), 2):
+        segments[i] = (md5(segments[i]).hexdigest(), segments[i])
+    return segments
+
+
+# Compiled templates for content wrapped in the ``nevercache`` tag,
+# most recently used last. See ``nevercache_template`` below.
+_nevercache_templates = OrderedDict()
+_nevercache_templates_lock = Lock()
+
+
+def nevercache_template(source, source_hash=None):
+    """
+    Returns a compiled ``Template`` for content wrapped in the
+    ``nevercache`` tag, so that the second phase of rendering cached
+    responses doesn't need to parse the same template code on every
+    request. Compiled templates are stored per process, keyed by a
+    hash of their source, with the least recently used discarded
+    once there are more than ``CACHE_NEVERCACHE_TEMPLATES``.
+    """
+    if source_hash is None:
+        if isinstance(source, unicode):
+            source = source.encode("utf-8")
+        source_hash = md5(source).hexdigest()
+    with _nevercache_templates_lock:
+        try:
+            template = _nevercache_templates.pop(source_hash)
+        except KeyError:
+            template = None
+        else:
+            _nevercache_templates[source_hash] = template
+    if template is not None:
+        _stats["nevercache_hits"] += 1
+        return template
+    _stats["nevercache_misses"] += 1
+    template = Template(source)
+    max_size = settings.CACHE_NEVERCACHE_TEMPLATES
+    if max_size:
+        with _nevercache_templates_lock:
+            _nevercache_templates[source_hash] = template
+            while len(_nevercache_templates) > max_size:
+                _nevercache_templates.popitem(last=False)
+    return template
+
+
+# Cache tags are stored for 30 days, the maximum relative expiry
+# time supported by memcached.
+CACHE_TAG_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def _tag_key(tag):
+    """
+    Key for storing the time the given cache tag was last bumped.
+    """
+    prefix = settings.CACHE_MIDDLEWARE_KEY_PREFIX
+    return _hashed_key("%s.tag.%s" % (prefix, tag))
+
+
+def model_cache_tag(model):
+    """
+    Returns the cache tag for the given model class or instance,
+    eg: ``blog.blogpost``. Proxy models, including those created for
+    instances with deferred fields, share the tag of their concrete
+    model.
+    """
+    opts = model._meta
+    if opts.proxy:
+        opts = opts.concrete_model._meta
+    return "%s.%s" % (opts.app_label, opts.object_name.lower())
+
+
+def instance_cache_tag(instance):
+    """
+    Returns the cache tag for the given model instance, eg:
+    ``blog.blogpost.1``.
+    """
+    return "%s.%s" % (model_cache_tag(instance), instance.pk)
+
+
+def cache_user_class(user):
+    """
+    Returns the class of the given user that cached content can vary
+    on, since staff can view unpublished content, and unauthenticated
+    users can't view content that requires login.
+    """
+    if user is not None and user.is_staff:
+        return "staff"
+    elif user is not None and user.is_authenticated():
+        return "user"
+    return "anonymous"
+
+
+def add_cache_tags(*tags):
+    """
+    Records the given cache tags against the current request, when
+    its response is being rendered for storing in cache by the cache
+    middleware. The cached response then becomes stale as soon as
+    any of its tags are bumped via ``bump_cache_tags``.
+    """
+    request_tags = getattr(current_request(), "_cache_tags", None)
+    if request_tags is not None:
+        request_tags.update(tags)
+
+
+def bump_cache_tags(*tags):
+    """
+    Stores the current time against each of the given cache tags,
+    marking everything cached before now with any of these tags as
+    stale.
+    """
+    bumped = time()
+    cache.set_many(dict([(_tag_key(t), bumped) for t in tags]),
+                   CACHE_TAG_TIMEOUT)
+
+
+def cache_tag_versions(tags):
+    """
+    Returns a dict mapping each of the given cache tags to the time
+    it was last bumped. Tags that have never been bumped are omitted.
+    """
+    keys = dict([(_tag_key(t), t) for t in tags])
+    found = cache.get_many(keys.keys())
+    return dict([(keys[k], bumped) for (k, bumped) in found.items()])
+
+
+def cache_tags_bumped(tags, since):
+    """
+    Returns ``True`` if any of the given cache tags have been bumped
+    since the given time.
+    """
+    return any([bumped >= since for bumped in
+                cache_tag_versions(tags).values()])
+
+
 def add_cache_bypass(url):
     """
     Adds the current time to the querystring of the URL to force a
@@ -101,3 +356,117 @@ def add_cache_bypass(url):
         hash_str = "#" + hash_str
     url += "?" if "?" not in url else "&"
     return url + "t=" + str(time()).replace(".", "") + hash_str
+
+
+def bump_model_cache_tag(sender, **kwargs):
+    """
+    Signal handler for ``post_save`` and ``post_delete`` that bumps
+    the cache tag for the model of the instance saved or deleted.
+    Saves that only update a user's ``last_login`` field, which
+    Django performs each time a user logs in, are ignored, since
+    cached values don't depend on it.
+    """
+    update_fields = kwargs.get("update_fields")
+    if update_fields and set(update_fields) <= set(["last_login"]):
+        return
+    bump_cache_tags(model_cache_tag(sender))
+
+
+def bump_model_cache_tags_on_change(models):
+    """
+    Connects ``bump_model_cache_tag`` to the ``post_save`` and
+    ``post_delete`` signals of each of the given models, for values
+    cached via ``cached_value`` that are built from models whose
+    cache tags aren't otherwise bumped. ``Displayable`` models are
+    skipped, since their tags are already bumped by the handlers in
+    ``mezzanine.core.models``, only when their listings may change.
+    """
+    from django.db.models.signals import post_delete, post_save
+    from mezzanine.core.models import Displayable
+    for model in models:
+        if issubclass(model, Displayable):
+            continue
+        uid = "bump_model_cache_tag_%s" % model_cache_tag(model)
+        post_save.connect(bump_model_cache_tag, sender=model,
+                          dispatch_uid=uid)
+        post_delete.connect(bump_model_cache_tag, sender=model,
+                            dispatch_uid=uid)
+
+
+def next_visibility_change(models=None):
+    """
+    Returns the number of seconds until items of any of the given
+    models next become published or expire, for models with a
+    ``PublishedManager``, or ``None`` if no such change is scheduled.
+    Without any models, every concrete ``Displayable`` model is
+    checked, giving the next time any published content on the
+    current site changes.
+    """
+    if models is None:
+        models = displayable_models()
+    changes = []
+    for model in models:
+        manager = model._default_manager
+        if hasattr(manager, "next_visibility_change"):
+            change = manager.next_visibility_change()
+            if change is not None:
+                changes.append(change)
+    if not changes:
+        return None
+    return max(int((min(changes) - now()).total_seconds()) + 1, 1)
+
+
+def displayable_models():
+    """
+    Returns each concrete ``Displayable`` model, excluding those that
+    extend another via multi-table inheritance, such as subclasses of
+    ``Page``, since their items are also items of the parent model.
+    """
+    from django.db.models import get_models
+    from mezzanine.core.models import Displayable
+    is_displayable = lambda model: issubclass(model, Displayable)
+    return [model for model in get_models() if is_displayable(model) and
+            not any(map(is_displayable, model._meta.get_parent_list()))]
+
+
+def cached_value(name, models, func, *args, **kwargs):
+    """
+    Returns the result of calling ``func`` with the given args, stored
+    in cache when it's installed. The cache key is made up of the
+    given name and args, the current site, and the version of the
+    cache tag for each of the given models, so the value is
+    regenerated whenever an instance of any of the models is saved or
+    deleted, as long as ``bump_model_cache_tags_on_change`` has been
+    called for them. For ``Displayable`` models, that's only when the
+    change may affect where the instance is listed, as determined by
+    the model's ``listing_fields``. The value also expires when items
+    of any of the models are next published or expire, via
+    ``next_visibility_change``.
+
+    The model cache tags are recorded against the current request,
+    whether or not the value is found in cache.
+    """
+    tags = [model_cache_tag(model) for model in models]
+    add_cache_tags(*tags)
+    if not cache_installed():
+        return func(*args, **kwargs)
+    versions = cache_tag_versions(tags)
+    # Model instances given as args are keyed by their primary key.
+    key_arg = lambda a: instance_cache_tag(a) if hasattr(a, "_meta") else a
+    cache_key = "%s.value.%s.%s.%r.%r.%r" % (
+        settings.CACHE_MIDDLEWARE_KEY_PREFIX, name, current_site_id(),
+        [versions.get(tag, 0) for tag in tags], map(key_arg, args),
+        sorted([(k, key_arg(v)) for (k, v) in kwargs.items()]))
+    value = cache_get(cache_key)
+    if value is None:
+        try:
+            value = func(*args, **kwargs)
+        except:
+            cache_release(cache_key)
+            raise
+        timeout = settings.CACHE_MIDDLEWARE_SECONDS
+        change = next_visibility_change(models)
+        if change is not None:
+            timeout = min(timeout, change)
+        cache_set(cache_key, value, timeout)
+    return value
@@ -1,11 +1,15 @@
 
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from datetime import datetime, timedelta
-
+from json import dumps, loads
+from math import ceil
 from urllib import urlencode
 from urllib2 import Request, urlopen
 
 import django
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator, InvalidPage, EmptyPage
+from django.db.models import Q
 from django.forms import EmailField, URLField, Textarea
 from django.template import RequestContext
 from django.template.response import TemplateResponse
@@ -117,11 +121,214 @@ def is_spam(request, form, url):
             return True
 
 
-def paginate(objects, page_num, per_page, max_paging_links):
+class KeysetPaginator(object):
+    """
+    Provides the ``count`` and ``num_pages`` attributes of Django's
+    ``Paginator`` for a ``KeysetPage``. Objects are only counted when
+    these are accessed, and then only up to the number given by the
+    ``PAGINATION_COUNT_LIMIT`` setting, in which case
+    ``count_is_approximate`` is ``True`` and ``num_pages`` is ``None``.
+    Querysets are counted by retrieving the primary keys of at most
+    that many objects, since ``count`` on a sliced queryset still
+    counts every object. Search results are counted by the search
+    itself, which finds every match anyway, so they're exempt.
+    """
+
+    def __init__(self, objects, per_page):
+        self.objects = objects
+        self.per_page = per_page
+        self.count_is_approximate = False
+        self._count = None
+
+    @property
+    def count(self):
+        if self._count is None:
+            limit = settings.PAGINATION_COUNT_LIMIT
+            if limit and hasattr(self.objects, "values_list"):
+                pks = self.objects.values_list("pk", flat=True)
+                count = len(pks[:limit + 1])
+            else:
+                try:
+                    count = self.objects.count()
+                except (AttributeError, TypeError):
+                    # Lists have a ``count`` method requiring an
+                    # argument.
+                    count = len(self.objects)
+            if limit and count > limit:
+                count = limit
+                self.count_is_approximate = True
+            self._count = count
+        return self._count
+
+    @property
+    def num_pages(self):
+        count = self.count
+        if self.count_is_approximate:
+            return None
+        return max(int(ceil(count / float(self.per_page))), 1)
+
+
+class KeysetPage(object):
+    """
+    Page of objects located by an opaque cursor rather than a page
+    number, providing the same interface as Django's ``Page`` so that
+    templates work with either, with ``next_page_number`` and
+    ``previous_page_number`` returning cursors.
+
+    When ordering fields are given, the objects must be a queryset
+    and the cursor holds the values of those fields for the object
+    the page starts after or ends before, so the page is retrieved
+    with a filter on the fields rather than an offset, which the
+    database can serve from an index however deep the page is. The
+    fields must order the objects uniquely, eg:
+    ``("-publish_date", "-id")``. Without fields, the cursor holds the
+    position of the page, which still avoids counting the objects, and
+    is capped at the ``PAGINATION_COUNT_LIMIT`` setting, so that a
+    cursor can't make the database skip over any number of objects.
+    """
+
+    def __init__(self, objects, cursor, per_page, fields=None):
+        self.paginator = KeysetPaginator(objects, per_page)
+        self.fields = fields
+        self.visible_page_range = []
+        try:
+            position, before, values = self.decode_cursor(objects, cursor)
+        except (IndexError, KeyError, TypeError, ValueError,
+                ValidationError):
+            position, before, values = 0, False, None
+        self.position = max(position, 0)
+        limit = settings.PAGINATION_COUNT_LIMIT
+        if not fields and limit:
+            last = (limit - 1) // per_page * per_page
+            self.position = min(self.position, last)
+        self._has_previous = self.position > 0
+        self._has_next = False
+        if not fields:
+            items = list(objects[self.position:self.position + per_page + 1])
+            self._has_next = len(items) > per_page and (
+                not limit or self.position + per_page < limit)
+        else:
+            objects = objects.order_by(*fields)
+            if values is not None:
+                if before:
+                    fields = ["-" + f if f[0] != "-" else f[1:]
+                              for f in fields]
+                    objects = objects.order_by(*fields)
+                objects = objects.filter(self._after(fields, values))
+            items = list(objects[:per_page + 1])
+            if values is not None and before:
+                self._has_next = True
+                self._has_previous = len(items) > per_page
+                items = items[:per_page][::-1]
+                if not self._has_previous:
+                    self.position = 0
+            else:
+                self._has_next = len(items) > per_page
+        self.object_list = items[:per_page]
+
+    def __repr__(self):
+        return "<Page %s>" % self.number
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def number(self):
+        return self.position // self.paginator.per_page + 1
+
+    def _after(self, fields, values):
+        """
+        Returns a ``Q`` object for the objects that follow the given
+        values in the order of the given fields.
+        """
+        q = None
+        for field, value in reversed(zip(fields, values)):
+            name = field.lstrip("-")
+            lookup = "%s__%s" % (name, "lt" if field[0] == "-" else "gt")
+            condition = Q(**{lookup: value})
+            if q is not None:
+                condition |= Q(**{name: value}) & q
+            q = condition
+        return q
+
+    def decode_cursor(self, objects, cursor):
+        """
+        Returns the position, direction and ordering field values
+        held in the given cursor.
+        """
+        cursor = str(cursor)
+        data = loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        position, before, values = int(data[0]), bool(data[1]), data[2]
+        if not self.fields:
+            return position, False, None
+        if values is None:
+            return 0, False, None
+        names = [field.lstrip("-") for field in self.fields]
+        if len(values) != len(names):
+            raise ValueError("Cursor doesn't match ordering")
+        opts = objects.model._meta
+        values = [opts.get_field(name).to_python(value)
+                  for (name, value) in zip(names, values)]
+        return position, before, values
+
+    def encode_cursor(self, position, before=False, obj=None):
+        """
+        Returns a cursor for the page at the given position, which
+        starts after or ends before the given object.
+        """
+        values = None
+        if self.fields and obj is not None:
+            values = []
+            for field in self.fields:
+                value = getattr(obj, field.lstrip("-"))
+                if hasattr(value, "isoformat"):
+                    value = value.isoformat()
+                values.append(value)
+        data = dumps([position, int(before), values])
+        return urlsafe_b64encode(data).rstrip("=")
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        position = self.position + len(self.object_list)
+        return self.encode_cursor(position, False, self.object_list[-1])
+
+    def previous_page_number(self):
+        position = max(self.position - self.paginator.per_page, 0)
+        first = self.object_list[0] if self.object_list else None
+        return self.encode_cursor(position, True, first)
+
+    def start_index(self):
+        return self.position + 1 if self.object_list else 0
+
+    def end_index(self):
+        return self.position + len(self.object_list)
+
+
+def paginate(objects, page_num, per_page, max_paging_links, keyset=None):
     """
     Return a paginated page for the given objects, giving it a custom
     ``visible_page_range`` attribute calculated from ``max_paging_links``.
+
+    If the ``PAGINATION_KEYSET`` setting is ``True``, ``page_num`` is
+    a cursor and a ``KeysetPage`` is returned instead, ordered by the
+    field names given by ``keyset``.
     """
+    if settings.PAGINATION_KEYSET:
+        return KeysetPage(objects, page_num, per_page, keyset)
     paginator = Paginator(objects, per_page)
     try:
         page_num = int(page_num)